@@ -0,0 +1,89 @@
+# Measures what a cached redirect costs the worker on the bare ASGI fast path (`REDIRECT_FAST_PATH`, the default) and
+# through the FastAPI routing it bypasses. Requests are handed to the application directly, without a server or a
+# client, and every code is cached beforehand, so no database is needed and the numbers are the framework overhead:
+#
+#   python -m benchmarks.redirect --requests 100000
+import argparse
+import asyncio
+import json
+from datetime import date, timedelta
+
+from fastapi import FastAPI
+from starlette.types import Message
+
+from benchmarks import timing
+from source.settings import settings
+from source.utils.cache import CACHE
+
+CODES = [f"code{index}" for index in range(1000)]
+
+
+def build(fast_path: bool) -> FastAPI:
+    settings.rate_limit_requests = 10**9  # never throttled
+    settings.rate_limit_redirect_requests = None
+    settings.redirect_fast_path = fast_path
+
+    from source.app import create_app  # pylint: disable=import-outside-toplevel  # after the settings are adjusted
+
+    return create_app()
+
+
+async def call(application: FastAPI, code: str) -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": f"/d/{code}",
+        "raw_path": f"/d/{code}".encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    sent: list[Message] = []
+
+    async def receive() -> Message:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Message) -> None:
+        sent.append(message)
+
+    await application(scope, receive, send)
+    return int(sent[0]["status"])
+
+
+async def measure(application: FastAPI, requests: int) -> dict[str, float]:
+    for code in CODES:  # Warm-up, which also checks that every request is served from the cache
+        assert await call(application, code) == 308
+
+    codes = [CODES[index % len(CODES)] for index in range(requests)]
+    return await timing.measure(lambda code: call(application, code), codes, unit="request")
+
+
+async def main(requests: int) -> None:
+    settings.cache_size = max(settings.cache_size, len(CODES))
+    settings.cache_ttl_seconds = 3600
+    CACHE.size, CACHE.ttl = settings.cache_size, settings.cache_ttl_seconds
+    for code in CODES:
+        CACHE.set(code, f"https://example.com/{code}", date.today() + timedelta(days=1))
+
+    results = {
+        name: await measure(build(fast_path=fast_path), requests)
+        for name, fast_path in (("routed", False), ("fast_path", True))
+    }
+    results["saved_us_per_request"] = {
+        key: round(results["routed"][key] - results["fast_path"][key], 1) for key in results["routed"]
+    }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the redirect fast path with the routed endpoint.")
+    parser.add_argument("--requests", type=int, default=100_000)
+    arguments = parser.parse_args()
+
+    asyncio.run(main(requests=arguments.requests))
@@ -0,0 +1,21 @@
+# Shared by the micro-benchmarks: times every call on its own (wall clock) and divides the process CPU time of the
+# whole run by the number of calls.
+import statistics
+import time
+from collections.abc import Awaitable, Callable, Sequence
+
+
+async def measure[T](call: Callable[[T], Awaitable[object]], arguments: Sequence[T], unit: str) -> dict[str, float]:
+    latencies = []
+    cpu = time.process_time()
+    for argument in arguments:
+        started = time.perf_counter()
+        await call(argument)
+        latencies.append((time.perf_counter() - started) * 1e6)
+    cpu = time.process_time() - cpu
+
+    return {
+        "p50_us": round(statistics.median(latencies), 1),
+        "p99_us": round(statistics.quantiles(latencies, n=100)[98], 1),
+        f"cpu_us_per_{unit}": round(cpu / len(arguments) * 1e6, 1),
+    }
@@ -1,13 +1,64 @@
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi_throttle import RateLimiter
 
+from source.database.connection import ENGINE, REPLICA_ENGINE
+from source.database.lookup import POOLS
+from source.endpoints.decode import RedirectMiddleware
 from source.endpoints.decode import router as decode_router
 from source.endpoints.encode import router as encode_router
 from source.endpoints.focal import router as focal_router
 from source.endpoints.management import router as management_router
+from source.endpoints.metrics import router as metrics_router
 from source.endpoints.status import router as status_router
+from source.endpoints.transfer import router as transfer_router
 from source.settings import settings
+from source.utils.admission import ADMISSION
+from source.utils.allocator import RESERVOIR
+from source.utils.analytics import CLICKS
+from source.utils.bloom import CODE_FILTER
+from source.utils.invalidation import LISTENER
+from source.utils.metrics import METRICS, MetricsMiddleware, instrument
+from source.utils.shared import SHARED_LINKS
+from source.utils.sweeper import sweep
+from source.utils.tasks import repeat
+from source.utils.throttle import build_store, build_throttles
+
+
+@asynccontextmanager
+async def lifespan(application: FastAPI) -> AsyncIterator[None]:  # pylint: disable=unused-argument
+    instrument(ENGINE, database="primary")
+    if REPLICA_ENGINE is not None:
+        instrument(REPLICA_ENGINE, database="replica")
+
+    tasks = [
+        asyncio.create_task(repeat(settings.analytics_flush_interval_seconds, lambda: CLICKS.flush(ENGINE))),
+        asyncio.create_task(repeat(settings.sweep_interval_seconds, lambda: sweep(ENGINE))),
+        asyncio.create_task(repeat(settings.metrics_flush_interval_seconds, METRICS.publish)),
+        asyncio.create_task(repeat(settings.code_filter_sync_seconds, lambda: CODE_FILTER.refresh(ENGINE))),
+        asyncio.create_task(repeat(settings.code_reservoir_refill_seconds, lambda: RESERVOIR.refill(ENGINE))),
+    ]
+    if settings.invalidation_enabled:
+        tasks.append(asyncio.create_task(LISTENER.run(ENGINE)))
+    if SHARED_LINKS.enabled:  # Every worker tries, the one holding the lock refreshes
+        tasks.append(
+            asyncio.create_task(repeat(settings.shared_links_refresh_seconds, lambda: SHARED_LINKS.refresh(ENGINE)))
+        )
+
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        await CLICKS.flush(ENGINE)  # Counts recorded since the last tick would be lost otherwise
+        await POOLS.close()
+        SHARED_LINKS.close()
+        await METRICS.publish()
 
 
 def create_app() -> FastAPI:
@@ -16,22 +67,28 @@ def create_app() -> FastAPI:
         description="Tiny microservice for shortening URLs.",
         docs_url=None,
         redoc_url="/docs",
-        dependencies=[
-            Depends(RateLimiter(times=settings.rate_limit_requests, seconds=settings.rate_limit_window_seconds)),
-        ],
+        lifespan=lifespan,
     )
 
+    # Innermost, so that redirects still get CORS headers (a dictionary lookup for requests without an `Origin`)
+    application.add_middleware(RedirectMiddleware, enabled=settings.redirect_fast_path)
     application.add_middleware(
         CORSMiddleware,
         allow_origins=[settings.cors_origins],
         allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     )
+    application.add_middleware(MetricsMiddleware)  # Outermost, so that the timing covers the whole stack
+
+    # Every application gets its own buckets, shared by its routers; each group of endpoints has its own budget.
+    application.state.throttles = throttles = build_throttles(store=build_store())
 
-    application.include_router(decode_router)
-    application.include_router(encode_router)
-    application.include_router(management_router)
-    application.include_router(status_router)
-    application.include_router(focal_router)
+    application.include_router(decode_router, dependencies=[Depends(throttles["redirect"])])
+    application.include_router(encode_router, dependencies=[Depends(throttles["encode"])])  # admits on its own
+    application.include_router(management_router, dependencies=[Depends(throttles["management"]), Depends(ADMISSION)])
+    application.include_router(status_router, dependencies=[Depends(throttles["default"])])
+    application.include_router(transfer_router, dependencies=[Depends(throttles["management"]), Depends(ADMISSION)])
+    application.include_router(metrics_router)
+    application.include_router(focal_router, dependencies=[Depends(throttles["default"])])
 
     return application
 
@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import json
+import sys
+from collections.abc import AsyncIterator
+from datetime import date
+from pathlib import Path
+from typing import BinaryIO
+
+from source.database.connection import ENGINE
+from source.utils.transfer import Format, ImportReport, export_links, export_statement, import_links
+
+
+async def read_lines(path: Path) -> AsyncIterator[str]:
+    with path.open(encoding="utf-8") as file:
+        for line in file:
+            yield line
+
+
+async def run_import(path: Path, file_format: Format) -> ImportReport:
+    try:
+        return await import_links(engine=ENGINE, lines=read_lines(path), file_format=file_format)
+    finally:
+        await ENGINE.dispose()
+
+
+async def run_export(output: BinaryIO, file_format: Format, arguments: argparse.Namespace) -> None:
+    statement = export_statement(
+        expired=arguments.expired, registered_from=arguments.registered_from, registered_to=arguments.registered_to
+    )
+
+    try:
+        async for chunk in export_links(engine=ENGINE, statement=statement, file_format=file_format):
+            output.write(chunk)
+    finally:
+        await ENGINE.dispose()
+
+
+def detect_format(path: Path | None, file_format: Format | None) -> Format:
+    if file_format is not None:
+        return file_format
+    return "csv" if path is not None and path.suffix.lower() == ".csv" else "ndjson"
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m source.cli", description="Maintenance commands of tURL.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importer = commands.add_parser("import", help="Imports `url,code,lifetime` rows in bulk.")
+    importer.add_argument("path", type=Path, help="NDJSON or CSV file to import.")
+    importer.add_argument("--format", choices=["ndjson", "csv"], help="Defaults to the file extension.")
+
+    exporter = commands.add_parser("export", help="Exports all links.")
+    exporter.add_argument("--output", type=Path, help="Defaults to the standard output.")
+    exporter.add_argument("--format", choices=["ndjson", "csv"], help="Defaults to the output extension.")
+    exporter.add_argument("--expired", action=argparse.BooleanOptionalAction, help="Only (non) expired links.")
+    exporter.add_argument("--registered-from", type=date.fromisoformat, help="Earliest registration date.")
+    exporter.add_argument("--registered-to", type=date.fromisoformat, help="Latest registration date.")
+
+    arguments = parser.parse_args(argv)
+
+    if arguments.command == "export":
+        file_format = detect_format(arguments.output, arguments.format)
+        if arguments.output is None:
+            asyncio.run(run_export(output=sys.stdout.buffer, file_format=file_format, arguments=arguments))
+        else:
+            with arguments.output.open("wb") as output:
+                asyncio.run(run_export(output=output, file_format=file_format, arguments=arguments))
+        return
+
+    report = asyncio.run(run_import(path=arguments.path, file_format=detect_format(arguments.path, arguments.format)))
+
+    json.dump(
+        {
+            "imported": report.imported,
+            "rejected": report.rejected,
+            "seconds": round(report.seconds, 3),
+            "rows_per_second": round(report.rows_per_second, 1),
+            "errors": report.errors,
+        },
+        sys.stdout,
+        indent=2,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,136 @@
-from collections.abc import AsyncIterator
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+import asyncpg
+from fastapi import Request, Response
+from sqlalchemy import QueuePool
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
 from source.settings import settings
 
+UNREACHABLE = (OSError, OperationalError, InterfaceError, asyncpg.PostgresConnectionError, asyncpg.InterfaceError)
+PRIMARY_COOKIE = "turl-primary"  # set on writes, routes the client's reads to the primary while replicas catch up
 
-def build_url() -> str:
-    return settings.database_url.replace("postgresql://", "postgresql+asyncpg://")
 
+def build_url(url: str = settings.database_url) -> str:
+    return url.replace("postgresql://", "postgresql+asyncpg://")
 
-ENGINE = create_async_engine(
-    build_url(),
-    pool_pre_ping=True,  # validates connections before use
-    pool_size=5,  # maximum number of persistent connections the pool keeps open
-    max_overflow=10,  # extra connections the pool can open temporarily if all pool_size connections are busy
-    pool_recycle=300,  # any connection older than 300 seconds (5 minutes) will be closed and replaced before reuse
+
+POOL_OPTIONS = {
+    "pool_pre_ping": settings.pool_pre_ping,
+    "pool_size": settings.pool_size,
+    "max_overflow": settings.pool_max_overflow,
+    "pool_recycle": settings.pool_recycle_seconds,
+    "pool_timeout": settings.pool_timeout_seconds,
+}
+
+ENGINE = create_async_engine(build_url(), **POOL_OPTIONS)
+
+REPLICA_ENGINE = (
+    create_async_engine(
+        build_url(settings.replica_database_url),
+        connect_args={"timeout": settings.replica_connect_timeout_seconds},  # an unreachable replica fails fast
+        **POOL_OPTIONS,
+    )
+    if settings.replica_database_url
+    else None
 )
 
 
 AsyncSessionLocal = async_sessionmaker(bind=ENGINE, expire_on_commit=False, autoflush=False)
 
 
+class ReadRouter:
+    # Picks the engine serving read-only requests: the replica, unless it failed within the last `retry` seconds or
+    # the code was written by this worker within the last `sticky` seconds (read-your-writes).
+    def __init__(self, primary: AsyncEngine, replica: AsyncEngine | None, retry: float, sticky: float) -> None:
+        self.primary = primary
+        self.replica = replica
+        self.retry = retry
+        self.sticky = sticky
+
+        self._failed_until = 0.0
+        self._written: OrderedDict[str, float] = OrderedDict()  # code -> deadline, oldest first
+
+    def engine(self, code: str | None = None) -> AsyncEngine:
+        now = time.monotonic()
+        while self._written and next(iter(self._written.values())) <= now:
+            self._written.popitem(last=False)
+
+        if self.replica is None or now < self._failed_until or code in self._written:
+            return self.primary
+        return self.replica
+
+    def fail(self) -> None:
+        self._failed_until = time.monotonic() + self.retry
+
+    async def read[T](self, engine: AsyncEngine, run: Callable[[AsyncEngine], Awaitable[T]]) -> T:
+        # Runs a read on `engine`, or on the primary if that is a replica which cannot be reached; it is then avoided.
+        try:
+            return await run(engine)
+        except UNREACHABLE:
+            if engine is self.primary:
+                raise
+
+        self.fail()
+        return await run(self.primary)
+
+    def remember(self, response: Response, *codes: str) -> None:
+        if self.replica is None:
+            return
+
+        deadline = time.monotonic() + self.sticky
+        for code in codes:
+            self._written.pop(code, None)
+            self._written[code] = deadline
+        response.set_cookie(PRIMARY_COOKIE, "1", max_age=int(self.sticky), httponly=True)
+
+    def reset(self) -> None:
+        self._failed_until = 0.0
+        self._written.clear()
+
+
+READS = ReadRouter(
+    primary=ENGINE,
+    replica=REPLICA_ENGINE,
+    retry=settings.replica_retry_seconds,
+    sticky=settings.read_your_writes_seconds,
+)
+
+
 async def get_session() -> AsyncIterator[AsyncSession]:
     async with AsyncSessionLocal() as session:
         yield session
+
+
+def read_engine(request: Request) -> AsyncEngine:
+    return READS.primary if PRIMARY_COOKIE in request.cookies else READS.engine(request.path_params.get("code"))
+
+
+@asynccontextmanager
+async def read_session(request: Request) -> AsyncIterator[AsyncSession]:
+    # Session for read-only endpoints. It connects on first use only, so requests that end up not querying (e.g. a
+    # redirect waiting on another's lookup) take no connection; `OrmLookup` falls back from an unreachable replica.
+    async with AsyncSessionLocal(bind=read_engine(request)) as session:
+        yield session
+
+
+def get_engine() -> AsyncEngine:
+    return ENGINE
+
+
+def pool_stats(engine: AsyncEngine) -> dict[str, int]:
+    # Live counters of a queue pool (connections are only counted while checked out of it); empty for other pools.
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {}
+
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),  # negative while the pool has not opened all of its connections yet
+    }
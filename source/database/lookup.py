@@ -0,0 +1,172 @@
+import asyncio
+import time
+from collections.abc import AsyncGenerator, Awaitable, Callable, Mapping, Sequence
+from datetime import date
+from typing import Any, Protocol
+
+import asyncpg
+from fastapi import Request
+from sqlalchemy import Executable, Result, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import joinedload
+
+from source.database.connection import READS, read_engine, read_session
+from source.database.models import Detail, Link
+from source.settings import settings
+from source.utils.metrics import METRICS
+
+REDIRECT = "SELECT url, expires_at FROM link WHERE code = $1 AND (expires_at IS NULL OR expires_at >= current_date)"
+INFO = """
+    SELECT link.url, link.expires_at, detail.length, detail.lifetime, detail.registered, detail.modified
+    FROM link JOIN detail ON detail.link_id = link.id
+    WHERE link.code = $1
+"""
+INFO_MANY = """
+    SELECT link.code, link.url, link.expires_at, detail.length, detail.lifetime, detail.registered, detail.modified
+    FROM link JOIN detail ON detail.link_id = link.id
+    WHERE link.code = ANY($1::text[])
+"""
+
+
+class Lookup(Protocol):
+    # The URL and expiry of an active link, or `None`.
+    async def redirect(self, code: str) -> tuple[str, date | None] | None: ...
+
+    # The link including its detail, or `None`.
+    async def info(self, code: str) -> Link | None: ...
+
+    # The links including their details by code, leaving out unknown codes.
+    async def info_many(self, codes: Sequence[str]) -> dict[str, Link]: ...
+
+
+class OrmLookup:
+    # The session connects on the first query, falling back to the primary like `RawLookup`.
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+
+    async def execute(self, statement: Executable) -> Result[Any]:
+        async def run(engine: AsyncEngine) -> Result[Any]:
+            if self.session.bind is not engine:
+                await self.session.close()  # Releases the failed connection
+                self.session.bind = engine
+            return await self.session.execute(statement)
+
+        if not isinstance(bind := self.session.bind, AsyncEngine):  # Bound to a connection, nothing to fall back from
+            return await self.session.execute(statement)
+        return await READS.read(bind, run)
+
+    async def redirect(self, code: str) -> tuple[str, date | None] | None:
+        row = (
+            await self.execute(select(Link.url, Link.expires_at).where(Link.code == code, Link.active()))
+        ).one_or_none()
+        return (row.url, row.expires_at) if row is not None else None
+
+    async def info(self, code: str) -> Link | None:
+        return (await self.execute(select(Link).options(joinedload(Link.detail)).where(Link.code == code))).scalar()
+
+    async def info_many(self, codes: Sequence[str]) -> dict[str, Link]:
+        links = (
+            await self.execute(select(Link).options(joinedload(Link.detail)).where(Link.code.in_(set(codes))))
+        ).scalars()
+        return {link.code: link for link in links}
+
+
+class RawPools:
+    # Lazily created asyncpg pools, one per engine, used next to the SQLAlchemy ones. Every connection keeps the
+    # statements it ran prepared (asyncpg's statement cache), so after warm-up a lookup is a single Bind/Execute.
+    def __init__(self, min_size: int, max_size: int, **options: Any) -> None:
+        self.min_size = min_size
+        self.max_size = max_size
+        self.options = options  # passed on to `asyncpg.create_pool`
+
+        self._pools: dict[AsyncEngine, asyncpg.Pool] = {}
+        self._lock = asyncio.Lock()
+
+    async def pool(self, engine: AsyncEngine) -> asyncpg.Pool:
+        if (pool := self._pools.get(engine)) is None:
+            async with self._lock:
+                if (pool := self._pools.get(engine)) is None:
+                    dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+                    pool = await asyncpg.create_pool(
+                        dsn, min_size=self.min_size, max_size=self.max_size, **self.options
+                    )
+                    self._pools[engine] = pool
+        return pool
+
+    async def fetchrow(self, engine: AsyncEngine, query: str, *arguments: object) -> asyncpg.Record | None:
+        async with (await self.pool(engine)).acquire() as connection:
+            return await connection.fetchrow(query, *arguments)
+
+    async def fetch(self, engine: AsyncEngine, query: str, *arguments: object) -> list[asyncpg.Record]:
+        async with (await self.pool(engine)).acquire() as connection:
+            return await connection.fetch(query, *arguments)
+
+    async def close(self) -> None:
+        pools, self._pools = list(self._pools.values()), {}
+        await asyncio.gather(*(pool.close() for pool in pools))
+
+
+POOLS = RawPools(min_size=settings.raw_pool_min_size, max_size=settings.raw_pool_max_size)
+
+
+class RawLookup:
+    # Skips the session, statement compilation and greenlet switches of the ORM path for the hottest reads.
+    def __init__(self, engine: AsyncEngine, pools: RawPools = POOLS) -> None:
+        self.engine = engine
+        self.pools = pools
+
+    async def fetchrow(self, query: str, code: str) -> asyncpg.Record | None:
+        return await self.run(self.pools.fetchrow, query, code)
+
+    async def fetch(self, query: str, codes: Sequence[str]) -> list[asyncpg.Record]:
+        return await self.run(self.pools.fetch, query, codes)
+
+    async def run[T](self, method: Callable[..., Awaitable[T]], query: str, argument: object) -> T:
+        return await READS.read(self.engine, lambda engine: self.timed(method, engine, query, argument))
+
+    @staticmethod
+    async def timed[T](method: Callable[..., Awaitable[T]], engine: AsyncEngine, query: str, argument: object) -> T:
+        started = time.perf_counter()
+        result = await method(engine, query, argument)
+
+        database = "primary" if engine is READS.primary else "replica"
+        METRICS.observe("turl_db_query_duration_seconds", time.perf_counter() - started, database=database)
+        return result
+
+    async def redirect(self, code: str) -> tuple[str, date | None] | None:
+        row = await self.fetchrow(REDIRECT, code)
+        return (row["url"], row["expires_at"]) if row is not None else None
+
+    async def info(self, code: str) -> Link | None:
+        if (row := await self.fetchrow(INFO, code)) is None:
+            return None
+
+        return build_link(code, row)
+
+    async def info_many(self, codes: Sequence[str]) -> dict[str, Link]:
+        rows = await self.fetch(INFO_MANY, list(set(codes)))
+        return {row["code"]: build_link(row["code"], row) for row in rows}
+
+
+def build_link(code: str, row: Mapping[Any, Any]) -> Link:
+    # Transient objects only, so that the response is built exactly like on the ORM path
+    return Link(
+        url=row["url"],
+        code=code,
+        expires_at=row["expires_at"],
+        detail=Detail(
+            length=row["length"],
+            lifetime=row["lifetime"],
+            registered=row["registered"],
+            modified=row["modified"],
+        ),
+    )
+
+
+async def get_lookup(request: Request) -> AsyncGenerator[Lookup]:
+    if settings.lookup_backend == "raw":
+        yield RawLookup(engine=read_engine(request))
+        return
+
+    async with read_session(request) as session:  # Closed with the lookup, however the caller closes it
+        yield OrmLookup(session)
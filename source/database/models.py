@@ -1,15 +1,18 @@
-from datetime import date, timedelta
+from datetime import date
 
 from sqlalchemy import (
+    BigInteger,
     CheckConstraint,
     Date,
     ForeignKey,
     Index,
     Integer,
+    LargeBinary,
     String,
     func,
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from sqlalchemy.sql.elements import ColumnElement
 
 from source.settings import settings
 
@@ -20,11 +23,22 @@ class Base(DeclarativeBase):
 
 class Link(Base):
     __tablename__ = "link"
-    __table_args__ = (Index("ix_link_code", "code"),)
+    __table_args__ = (
+        # The only index on `code`: it enforces uniqueness and covers the redirect lookup, which is answered by an
+        # index-only scan without touching the heap.
+        Index("uq_link_code", "code", unique=True, postgresql_include=["url", "expires_at"]),
+        Index("ix_link_expires_at", "expires_at", postgresql_where="expires_at IS NOT NULL"),
+        Index("ix_link_url_hash", "url_hash", postgresql_where="url_hash IS NOT NULL"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     url: Mapped[str] = mapped_column(String(2048), nullable=False)
-    code: Mapped[str] = mapped_column(String(64), nullable=False, unique=True)
+    code: Mapped[str] = mapped_column(String(64), nullable=False)
+    # Fingerprint of the normalized URL, only set for links created with `dedupe` so that other inserts skip its index
+    url_hash: Mapped[bytes | None] = mapped_column(LargeBinary(16), nullable=True)
+
+    # Denormalized from `Detail.registered + Detail.lifetime` so that redirects can filter on it without a join
+    expires_at: Mapped[date | None] = mapped_column(Date(), nullable=True)  # empty means infinite lifetime
 
     # SQL Alchemy Relations
     detail: Mapped["Detail"] = relationship(back_populates="link", cascade="all, delete-orphan", uselist=False)
@@ -33,19 +47,36 @@ class Link(Base):
     def encoded(self) -> str:
         return f"{settings.domain}/d/{self.code}"
 
+    @property
+    def expires_in(self) -> int | None:
+        if not self.expires_at:
+            return None
+        return (self.expires_at - date.today()).days
+
+    @property
+    def expired(self) -> bool:
+        if not self.expires_at:
+            return False
+        return date.today() > self.expires_at
+
+    @classmethod
+    def active(cls) -> ColumnElement[bool]:
+        return (cls.expires_at.is_(None)) | (cls.expires_at >= func.current_date())
+
 
 class Detail(Base):
     __tablename__ = "detail"
     __table_args__ = (
         CheckConstraint("length > 0", name="ck_detail_length_positive"),
         CheckConstraint("lifetime IS NULL OR lifetime > 0", name="ck_detail_lifetime_positive"),
-        Index("ix_detail_link_id", "link_id"),
     )
 
     id: Mapped[int] = mapped_column(primary_key=True)
 
     # Relations
-    link_id: Mapped[int] = mapped_column(ForeignKey("link.id", ondelete="CASCADE"), nullable=False, unique=True)
+    link_id: Mapped[int] = mapped_column(  # the unique constraint doubles as the index for joins
+        ForeignKey("link.id", ondelete="CASCADE"), nullable=False, unique=True
+    )
 
     # Encoding
     length: Mapped[int] = mapped_column(Integer())  # positive integer
@@ -58,20 +89,24 @@ class Detail(Base):
     # SQL Alchemy Relations
     link: Mapped["Link"] = relationship(back_populates="detail")
 
-    @property
-    def expires_at(self) -> date | None:
-        if self.lifetime is None:
-            return None
-        return self.registered + timedelta(days=self.lifetime)
 
-    @property
-    def expires_in(self) -> int | None:
-        if not self.expires_at:
-            return None
-        return (self.expires_at - date.today()).days
+def expiration(lifetime: int | None) -> ColumnElement[date] | None:
+    # Expiry date of a link registered today, evaluated by the database just like `Detail.registered`.
+    if lifetime is None:
+        return None
+    return func.current_date() + lifetime
 
-    @property
-    def expired(self) -> bool:
-        if not self.expires_at:
-            return False
-        return date.today() > self.expires_at
+
+class Counter(Base):
+    __tablename__ = "counter"
+
+    length: Mapped[int] = mapped_column(Integer(), primary_key=True)  # code length the counter allocates for
+    value: Mapped[int] = mapped_column(BigInteger(), nullable=False)  # first counter value not reserved yet
+
+
+class Click(Base):
+    __tablename__ = "click"
+
+    code: Mapped[str] = mapped_column(String(64), primary_key=True)
+    day: Mapped[date] = mapped_column(Date(), primary_key=True)
+    count: Mapped[int] = mapped_column(BigInteger(), nullable=False)  # redirects served for the code on that day
@@ -1,28 +1,173 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+import json
+from collections.abc import AsyncGenerator, Callable, Mapping
+from contextlib import asynccontextmanager
+from datetime import date
+from urllib.parse import quote
+
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request, status
 from fastapi.responses import RedirectResponse
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.types import ASGIApp, Receive, Scope, Send
 
-from source.database.connection import get_session
-from source.database.models import Link
+from source.database.lookup import Lookup, get_lookup
+from source.settings import settings
+from source.utils.admission import ADMISSION
+from source.utils.analytics import CLICKS
+from source.utils.batching import SingleFlight
+from source.utils.bloom import CODE_FILTER
+from source.utils.cache import CACHE, CacheEntry
+from source.utils.http import redirect_cache_control
+from source.utils.metrics import METRICS
+from source.utils.shared import SHARED_LINKS
 
 router = APIRouter()
 
+NOT_FOUND = "There's no `link` assigned to this code."
+PREFIX = "/d/"
+SAFE = ":/%#?=@[]!$&'()*+,;"  # characters `RedirectResponse` leaves unquoted in the location
+
+
+def cached(code: str) -> CacheEntry | None:
+    # Shared hits are not copied into this worker's cache, the shared table holds them once per host.
+    return CACHE.get(code) or SHARED_LINKS.get(code)
+
+
+LOOKUPS: SingleFlight[str, tuple[str | None, date | None]] = SingleFlight(
+    timeout=settings.redirect_coalescing_timeout_seconds, enabled=settings.redirect_coalescing
+)
+
+
+async def load(code: str, lookup: Lookup) -> tuple[str | None, date | None]:
+    async with ADMISSION.slot():  # Cache hits never wait for the database
+        url, expires_at = await lookup.redirect(code) or (None, None)
+    CACHE.set(code, url, expires_at)
+    return url, expires_at
+
+
+async def fetch(code: str, lookup: Lookup) -> tuple[str | None, date | None]:
+    # The URL (`None` for unknown codes) and expiry of a code that is not cached.
+    if CODE_FILTER.rejects(code):  # Certainly no such link; not cached, the filter is about as cheap
+        METRICS.inc("turl_code_filter_rejections_total")
+        return None, None
+
+    try:  # A link going viral misses the cache many times at once, its concurrent redirects share one lookup
+        url, expires_at = await LOOKUPS.run(code, lambda: load(code, lookup))
+    except TimeoutError:
+        METRICS.inc("turl_coalescing_timeouts_total")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The service is saturated. Try again shortly.",
+            headers={"Retry-After": str(settings.admission_retry_after_seconds)},
+        ) from None
+
+    if url is not None and not CODE_FILTER.may_exist(code):  # Created by another worker, not heard of yet
+        METRICS.inc("turl_code_filter_misses_total")
+        CODE_FILTER.add(code)
+    return url, expires_at
+
 
 @router.get(
     "/d/{code}",
     summary="Redirects to the original URL.",
     tags=["Encryption"],
-    status_code=status.HTTP_308_PERMANENT_REDIRECT,
+    status_code=settings.redirect_status,
     responses={
         status.HTTP_404_NOT_FOUND: {"description": "There's no `link` assigned to this code."},
     },
 )
 # pylint: disable=unused-argument
-async def decode(request: Request, code: str, db_session: AsyncSession = Depends(get_session)) -> RedirectResponse:
-    url = await db_session.scalar(select(Link.url).where(Link.code == code))
+async def decode(request: Request, code: str, lookup: Lookup = Depends(get_lookup)) -> RedirectResponse:
+    if (entry := cached(code)) is not None:
+        url, expires_at = entry.url, entry.expires_at
+    else:
+        url, expires_at = await fetch(code, lookup)
 
     if url is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="There's no `link` assigned to this code.")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=NOT_FOUND)
+
+    CLICKS.record(code)  # Only counted in memory, the rollup is written in the background
+    return RedirectResponse(
+        status_code=settings.redirect_status, url=url, headers={"Cache-Control": redirect_cache_control(expires_at)}
+    )
+
+
+ROUTE = router.routes[0]  # reported as the matched route, so that metrics label both paths alike
+
+
+def match(scope: Scope) -> str | None:
+    # The code of a `GET /d/{code}` request.
+    if scope["type"] != "http" or scope["method"] != "GET" or not scope["path"].startswith(PREFIX):
+        return None
+    code = scope["path"][len(PREFIX) :]
+    return code if code and "/" not in code else None
+
+
+class RedirectMiddleware:
+    # Serves `GET /d/{code}` without routing, dependency resolution or response objects, which is most of the cost of
+    # a cached redirect. Everything else (and every request if disabled) goes on to the application. It keeps the
+    # semantics of `decode`: the redirect throttle, dependency overrides of `get_lookup`, admission and the responses.
+    # Nothing is resolved here, so an override of `get_lookup` must take the request, like it, and no other dependency.
+    def __init__(self, app: ASGIApp, enabled: bool = True) -> None:
+        self.app = app
+        self.enabled = enabled
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self.enabled or (code := match(scope)) is None:
+            await self.app(scope, receive, send)
+            return
+
+        application: FastAPI = scope["app"]
+        scope["route"], scope["path_params"] = ROUTE, {"code": code}
+        request = Request(scope, receive)
+
+        try:
+            await application.state.throttles["redirect"](request)
+            url, expires_at = await self.lookup(application, request, code)
+        except HTTPException as error:
+            await respond(send, error.status_code, detail=error.detail, headers=error.headers)
+            return
+
+        if url is None:
+            await respond(send, status.HTTP_404_NOT_FOUND, detail=NOT_FOUND)
+            return
+
+        CLICKS.record(code)
+        await send(
+            {
+                "type": "http.response.start",
+                "status": settings.redirect_status,
+                "headers": [
+                    (b"cache-control", redirect_cache_control(expires_at).encode()),
+                    (b"content-length", b"0"),
+                    (b"location", quote(url, safe=SAFE).encode("latin-1")),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": b""})
+
+    @staticmethod
+    async def lookup(application: FastAPI, request: Request, code: str) -> tuple[str | None, date | None]:
+        if (entry := cached(code)) is not None:  # Hits never open a lookup
+            return entry.url, entry.expires_at
+
+        provider: Callable[[Request], AsyncGenerator[Lookup]] = application.dependency_overrides.get(
+            get_lookup, get_lookup
+        )
+        async with asynccontextmanager(provider)(request) as lookup:  # Closed the way FastAPI closes dependencies
+            return await fetch(code, lookup)
+
 
-    return RedirectResponse(status_code=status.HTTP_308_PERMANENT_REDIRECT, url=url)
+async def respond(send: Send, code: int, detail: str, headers: Mapping[str, str] | None = None) -> None:
+    # Same body and headers as FastAPI's handler of `HTTPException`.
+    body = json.dumps({"detail": detail}, ensure_ascii=False, separators=(",", ":")).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": code,
+            "headers": [
+                (b"content-length", str(len(body)).encode()),
+                (b"content-type", b"application/json"),
+                *((key.lower().encode("latin-1"), value.encode("latin-1")) for key, value in (headers or {}).items()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
@@ -1,26 +1,187 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status
-from pydantic import BaseModel, HttpUrl, PositiveInt
+from collections.abc import Sequence
+from datetime import timedelta
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from pydantic import BaseModel, Field, HttpUrl, PositiveInt, ValidationError
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
 
-from source.database.connection import get_session
-from source.database.models import Detail, Link
+from source.database.connection import READS, get_engine, get_session
+from source.database.models import Detail, Link, expiration
 from source.settings import settings
-from source.utils.functions import code
+from source.utils.admission import ADMISSION
+from source.utils.allocator import ALLOCATOR, RESERVOIR, CodeSpaceExhaustedError
+from source.utils.batching import GroupCommit
+from source.utils.bloom import CODE_FILTER
+from source.utils.cache import CACHE
+from source.utils.functions import fingerprint
+from source.utils.invalidation import publish
+from source.utils.metrics import METRICS
 
 router = APIRouter()
 
+NOT_GENERATED = "Could not generate a unique code. Try again or increase `length`."
+
 
 class EncodeRequest(BaseModel):
     url: HttpUrl
     lifetime: PositiveInt | None
     length: PositiveInt
+    dedupe: bool = False  # reuse the code of an equivalent active link with the same length and expiry if there is one
 
 
 class EncodeResponse(BaseModel):
     url: HttpUrl
 
 
+class EncodeBatchRequest(BaseModel):
+    items: list[dict[str, Any]] = Field(min_length=1, max_length=settings.max_batch_size)  # validated one by one
+
+
+class EncodeBatchItem(BaseModel):
+    url: HttpUrl | None = None
+    error: str | None = None
+
+
+class EncodeBatchResponse(BaseModel):
+    results: list[EncodeBatchItem]  # in the same order as the requested items
+
+
+async def find_duplicates(
+    executor: AsyncConnection | AsyncSession, requests: Sequence[EncodeRequest]
+) -> dict[int, str]:
+    # Codes of existing links equivalent to the requests that opted into deduplication, i.e. with the same normalized
+    # URL and code length that expire on the same day a new link would. One lookup of `ix_link_url_hash` serves all.
+    # Only links created with `dedupe` are fingerprinted, the others (and imports) skip the hash and its index.
+    hashes = {index: fingerprint(str(request.url)) for index, request in enumerate(requests) if request.dedupe}
+    if not hashes:
+        return {}
+
+    rows = (
+        await executor.execute(
+            select(Link.url_hash, Link.code, Link.expires_at, func.current_date()).where(
+                Link.url_hash.in_(set(hashes.values())), Link.active()
+            )
+        )
+    ).all()
+    if not rows:
+        return {}
+
+    today = rows[0][3]
+    existing: dict[tuple, str] = {}
+    for url_hash, code, expires_at, _ in rows:
+        existing.setdefault((url_hash, len(code), expires_at), code)
+
+    duplicates = {}
+    for index, url_hash in hashes.items():
+        lifetime = requests[index].lifetime
+        expires_at = today + timedelta(days=lifetime) if lifetime is not None else None
+        if match := existing.get((url_hash, requests[index].length, expires_at)):
+            duplicates[index] = match
+
+    return duplicates
+
+
+def find_twins(requests: Sequence[EncodeRequest]) -> dict[int, int]:
+    # Maps later deduplicating requests to the first equal one, so that a batch creates a single link for them.
+    firsts: dict[tuple, int] = {}
+    twins: dict[int, int] = {}
+
+    for index, request in enumerate(requests):
+        if request.dedupe:
+            key = (fingerprint(str(request.url)), request.length, request.lifetime)
+            if (first := firsts.setdefault(key, index)) != index:
+                twins[index] = first
+
+    return twins
+
+
+async def create_links(engine: AsyncEngine, requests: Sequence[EncodeRequest]) -> list[str | None]:
+    # Persists all requests with one multi-row INSERT per table. Only the codes that conflicted with existing ones
+    # are re-generated, and requests whose code could not be generated are reported as `None`. Requests opting into
+    # deduplication reuse existing codes, and equal ones within the batch share a single new link. Codes are
+    # allocated while no connection is held, as the allocator takes one of its own, so every attempt commits the links
+    # it inserted in a transaction of its own.
+    codes: dict[int, str] = {}
+    twins = find_twins(requests)
+
+    if any(request.dedupe for request in requests):
+        async with engine.connect() as connection:
+            codes.update(await find_duplicates(connection, requests))
+    pending = [index for index in range(len(requests)) if index not in codes and index not in twins]
+
+    for _ in range(settings.max_code_generation_attempts):
+        if not pending:
+            break
+
+        candidates: dict[int, str] = {}
+        for length in {requests[index].length for index in pending}:
+            indexes = [index for index in pending if requests[index].length == length]
+            allocated = RESERVOIR.take_many(length=length, count=len(indexes))
+            allocated += await ALLOCATOR.allocate_many(
+                engine=engine, length=length, count=len(indexes) - len(allocated)
+            )
+            candidates.update(zip(indexes, allocated, strict=False))
+
+        if not candidates:
+            break
+
+        async with engine.begin() as connection:
+            rows = await connection.execute(
+                insert(Link)
+                .values(
+                    [
+                        {
+                            "url": str(requests[index].url),
+                            "code": code,
+                            "url_hash": fingerprint(str(requests[index].url)) if requests[index].dedupe else None,
+                            "expires_at": expiration(requests[index].lifetime),
+                        }
+                        for index, code in candidates.items()
+                    ]
+                )
+                .on_conflict_do_nothing(index_elements=[Link.code])
+                .returning(Link.id, Link.code)
+            )
+            inserted = {code: link_id for link_id, code in rows}
+            link_ids = {index: inserted[code] for index, code in candidates.items() if code in inserted}
+
+            if link_ids:
+                await publish(connection, "created", (candidates[index] for index in link_ids))
+                await connection.execute(
+                    insert(Detail).values(
+                        [
+                            {"link_id": link_id, "length": requests[index].length, "lifetime": requests[index].lifetime}
+                            for index, link_id in link_ids.items()
+                        ]
+                    )
+                )
+
+        CODE_FILTER.add(*inserted)
+        codes.update((index, candidates[index]) for index in link_ids)
+        pending = [index for index in pending if index not in codes]
+        if pending:
+            METRICS.inc("turl_encode_retries_total", len(pending), endpoint="encode_batch")
+
+    CACHE.invalidate(*codes.values())  # Drop negative entries of codes probed before they existed
+    return [codes.get(twins.get(index, index)) for index in range(len(requests))]
+
+
+async def commit_group(engine: AsyncEngine, requests: list[EncodeRequest]) -> list[str | None]:
+    async with ADMISSION.slot():  # One for the whole group
+        return await create_links(engine=engine, requests=requests)
+
+
+GROUP_COMMIT: GroupCommit[AsyncEngine, EncodeRequest, str | None] = GroupCommit(
+    flush=commit_group,
+    delay=settings.encode_group_commit_delay_seconds,
+    size=settings.encode_group_commit_size,
+)
+
+
 @router.post(
     "/encode",
     summary="Encodes a long URL into a short one.",
@@ -28,33 +189,97 @@ class EncodeResponse(BaseModel):
     response_model=EncodeResponse,
     status_code=status.HTTP_201_CREATED,
     responses={
-        status.HTTP_406_NOT_ACCEPTABLE: {
-            "description": "Could not generate a unique code. Try again or increase `length`."
-        }
+        status.HTTP_200_OK: {"description": "An equivalent link exists already and its code is reused."},
+        status.HTTP_406_NOT_ACCEPTABLE: {"description": NOT_GENERATED},
     },
 )
 async def encode(  # pylint: disable=unused-argument
-    request: Request, payload: EncodeRequest, db_session: AsyncSession = Depends(get_session)
+    request: Request,
+    response: Response,
+    payload: EncodeRequest,
+    db_session: AsyncSession = Depends(get_session),
+    engine: AsyncEngine = Depends(get_engine),
 ) -> EncodeResponse:
-    for _ in range(settings.max_code_generation_attempts):  # Cheaper than making a database call
-        candidate = code(length=payload.length)
+    # No admission dependency on this route: requests joining a group commit wait without a slot, its flush takes one
+    if payload.dedupe:
+        async with ADMISSION.slot(), db_session.begin():
+            duplicates = await find_duplicates(db_session, [payload])
 
-        link = Link(
-            url=str(payload.url), code=candidate, detail=Detail(length=payload.length, lifetime=payload.lifetime)
-        )
+        if duplicates:
+            response.status_code = status.HTTP_200_OK
+            return EncodeResponse(url=HttpUrl(f"{settings.domain}/d/{duplicates[0]}"))
+
+    # Inserted along with the requests arriving at the same time, conflicting codes are regenerated per request
+    if settings.encode_group_commit:
+        if (code := await GROUP_COMMIT.submit(engine, payload)) is None:
+            raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=NOT_GENERATED)
 
-        async with db_session.begin():
-            db_session.add(link)
+        READS.remember(response, code)
+        return EncodeResponse(url=HttpUrl(f"{settings.domain}/d/{code}"))
 
+    # Allocated codes never repeat, so only codes inserted by other means (legacy or imported ones) can collide.
+    async with ADMISSION.slot():
+        for _ in range(settings.max_code_generation_attempts):
             try:
-                await db_session.flush()
-                return EncodeResponse(url=HttpUrl(link.encoded))
-            except IntegrityError:
-                await db_session.rollback()
+                candidate = RESERVOIR.take(payload.length)
+                candidate = candidate or await ALLOCATOR.allocate(engine=engine, length=payload.length)
+            except CodeSpaceExhaustedError:
+                break
 
-    # Exhausted all attempts to generate a unique short code.
+            link = Link(
+                url=str(payload.url),
+                code=candidate,
+                url_hash=fingerprint(str(payload.url)) if payload.dedupe else None,
+                expires_at=expiration(payload.lifetime),
+                detail=Detail(length=payload.length, lifetime=payload.lifetime),
+            )
+
+            async with db_session.begin():
+                db_session.add(link)
+
+                try:
+                    await db_session.flush()
+                    await publish(db_session, "created", [candidate])
+                    CACHE.invalidate(candidate)  # Drop a negative entry of the code probed before it existed
+                    CODE_FILTER.add(candidate)
+                    READS.remember(response, candidate)  # The replica may not have replayed the insert yet
+                    return EncodeResponse(url=HttpUrl(link.encoded))
+                except IntegrityError:
+                    await db_session.rollback()
+                    METRICS.inc("turl_encode_retries_total", endpoint="encode")
+
+    # Exhausted all attempts to generate a unique short code or the code space of this length is used up.
     # Consider increasing the 'length' parameter to expand the available code space.
-    raise HTTPException(
-        status_code=status.HTTP_406_NOT_ACCEPTABLE,
-        detail="Could not generate a unique code. Try again or increase `length`.",
-    )
+    raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=NOT_GENERATED)
+
+
+@router.post(
+    "/encode/batch",
+    summary="Encodes many long URLs at once.",
+    tags=["Encryption"],
+    response_model=EncodeBatchResponse,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(ADMISSION)],
+)
+async def encode_batch(  # pylint: disable=unused-argument
+    request: Request, response: Response, payload: EncodeBatchRequest, engine: AsyncEngine = Depends(get_engine)
+) -> EncodeBatchResponse:
+    results = [EncodeBatchItem() for _ in payload.items]
+    requests: dict[int, EncodeRequest] = {}
+
+    for index, item in enumerate(payload.items):
+        try:
+            requests[index] = EncodeRequest.model_validate(item)
+        except ValidationError as error:
+            results[index].error = "; ".join(detail["msg"] for detail in error.errors())
+
+    codes = await create_links(engine=engine, requests=list(requests.values())) if requests else []
+    READS.remember(response, *(code for code in codes if code is not None))
+
+    for index, created in zip(requests, codes, strict=True):
+        if created is None:
+            results[index].error = NOT_GENERATED
+        else:
+            results[index].url = HttpUrl(f"{settings.domain}/d/{created}")
+
+    return EncodeBatchResponse(results=results)
@@ -1,13 +1,18 @@
+from collections.abc import Collection
 from datetime import date
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
-from pydantic import BaseModel, HttpUrl, PositiveInt
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from pydantic import BaseModel, Field, HttpUrl, PositiveInt
+from sqlalchemy import func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
 
-from source.database.connection import get_session
-from source.database.models import Link
+from source.database.connection import READS, get_session
+from source.database.lookup import Lookup, build_link, get_lookup
+from source.database.models import Click, Detail, Link
+from source.settings import settings
+from source.utils.cache import CACHE
+from source.utils.http import entity_tag, http_date, not_modified
+from source.utils.invalidation import publish
 
 router = APIRouter()
 
@@ -24,19 +29,76 @@ class LinkInfo(BaseModel):
     modified: date | None
 
     expires_at: date | None
-    expires_in: PositiveInt | None
+    expires_in: int | None  # negative once the link has expired
     expired: bool
 
 
+class InfoBatchRequest(BaseModel):
+    codes: list[str] = Field(min_length=1, max_length=settings.max_batch_size)
+
+
+class ExtendBatchRequest(InfoBatchRequest):
+    lifetime: PositiveInt | None
+
+
+class LinkBatchResponse(BaseModel):
+    found: dict[str, LinkInfo]
+    missing: list[str]  # in the order they were requested
+
+
+class ClickDay(BaseModel):
+    day: date
+    count: int
+
+
+class ClickSeries(BaseModel):
+    total: int
+    days: list[ClickDay]
+
+
+async def extend_links(db_session: AsyncSession, codes: Collection[str], lifetime: int | None) -> dict[str, Link]:
+    # Adds `lifetime` days to the links (or makes them infinite) in one statement: the detail is updated first and the
+    # link's expiry derived from its result. Rows stay locked only while the statement runs.
+    extended = (
+        update(Detail)
+        .where(Detail.link_id == Link.id, Link.code.in_(set(codes)))
+        .values(lifetime=func.coalesce(Detail.lifetime, 0) + lifetime if lifetime else None)
+        .returning(Detail.link_id, Detail.length, Detail.lifetime, Detail.registered, Detail.modified)
+        .cte("extended")
+    )
+    statement = (
+        update(Link)
+        .where(Link.id == extended.c.link_id)
+        .values(expires_at=extended.c.registered + extended.c.lifetime)
+        .returning(
+            Link.code,
+            Link.url,
+            Link.expires_at,
+            extended.c.length,
+            extended.c.lifetime,
+            extended.c.registered,
+            extended.c.modified,
+        )
+        .execution_options(synchronize_session=False)  # Builds transient objects, nothing in the session to update
+    )
+
+    async with db_session.begin():
+        rows = (await db_session.execute(statement)).mappings().all()
+        await publish(db_session, "changed", (row["code"] for row in rows))
+
+    CACHE.invalidate(*codes)
+    return {row["code"]: build_link(row["code"], row) for row in rows}
+
+
 def populate_response_schema(link: Link) -> LinkInfo:
     return LinkInfo(
         url=HttpUrl(link.url),
         lifetime=link.detail.lifetime,
         registered=link.detail.registered,
         modified=link.detail.modified,
-        expires_at=link.detail.expires_at,
-        expires_in=link.detail.expires_in,
-        expired=link.detail.expired,
+        expires_at=link.expires_at,
+        expires_in=link.expires_in,
+        expired=link.expired,
     )
 
 
@@ -47,14 +109,14 @@ def populate_response_schema(link: Link) -> LinkInfo:
     response_model=LinkInfo,
     status_code=status.HTTP_200_OK,
     responses={
+        status.HTTP_304_NOT_MODIFIED: {"description": "The representation matches `If-None-Match` or is unchanged."},
         status.HTTP_404_NOT_FOUND: {
             "description": "There's no `link` assigned to this code or the link has been already revoked."
         },
     },
 )
-# pylint: disable=unused-argument
-async def info(request: Request, code: str, db_session: AsyncSession = Depends(get_session)) -> LinkInfo:
-    link = await db_session.scalar(select(Link).options(joinedload(Link.detail)).where(Link.code == code))
+async def info(request: Request, code: str, lookup: Lookup = Depends(get_lookup)) -> Response:
+    link = await lookup.info(code)
 
     if link is None:
         raise HTTPException(
@@ -62,7 +124,41 @@ async def info(request: Request, code: str, db_session: AsyncSession = Depends(g
             detail="There's no `link` assigned to this code or the link has been already revoked.",
         )
 
-    return populate_response_schema(link=link)
+    content = populate_response_schema(link=link).model_dump_json().encode()
+    # `expires_in` counts down, so the representation of an expiring link changes every day
+    last_modified = link.detail.modified or link.detail.registered
+    if link.expires_at is not None:
+        last_modified = max(last_modified, date.today())
+
+    # Revalidated on every use and kept out of shared caches, so a client pinned to the primary (`turl-primary`) reads
+    # its own writes. Unchanged links still cost only a 304
+    headers = {
+        "Cache-Control": "private, no-cache",
+        "ETag": (etag := entity_tag(content)),
+        "Last-Modified": http_date(last_modified),
+    }
+    if not_modified(request.headers, etag=etag, last_modified=last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+@router.post(
+    "/info/batch",
+    summary="Extracts information about many links at once.",
+    tags=["Management"],
+    response_model=LinkBatchResponse,
+    status_code=status.HTTP_200_OK,
+)
+# pylint: disable=unused-argument
+async def info_batch(
+    request: Request, payload: InfoBatchRequest, lookup: Lookup = Depends(get_lookup)
+) -> LinkBatchResponse:
+    links = await lookup.info_many(payload.codes)  # One query for all codes
+
+    return LinkBatchResponse(
+        found={code: populate_response_schema(link=link) for code, link in links.items()},
+        missing=[code for code in dict.fromkeys(payload.codes) if code not in links],
+    )
 
 
 @router.patch(
@@ -76,24 +172,67 @@ async def info(request: Request, code: str, db_session: AsyncSession = Depends(g
     },
 )
 async def extend(  # pylint: disable=unused-argument
-    request: Request, code: str, payload: ExtendRequest, db_session: AsyncSession = Depends(get_session)
+    request: Request,
+    response: Response,
+    code: str,
+    payload: ExtendRequest,
+    db_session: AsyncSession = Depends(get_session),
 ) -> LinkInfo:
-    async with db_session.begin():
-        link = await db_session.scalar(
-            select(Link).options(joinedload(Link.detail)).where(Link.code == code).with_for_update(of=Link)
-        )
+    if (link := (await extend_links(db_session, [code], payload.lifetime)).get(code)) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="There's no `link` assigned to this code.")
 
-        if not link:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="There's no `link` assigned to this code."
-            )
+    READS.remember(response, code)  # The replica may not have replayed the change yet
+    return populate_response_schema(link=link)
 
-        if payload.lifetime:
-            link.detail.lifetime = (link.detail.lifetime or 0) + payload.lifetime
-        else:
-            link.detail.lifetime = None
 
-        await db_session.flush()
-    await db_session.refresh(link.detail)
+@router.post(
+    "/extend/batch",
+    summary="Extends lifetime of many links at once.",
+    tags=["Management"],
+    response_model=LinkBatchResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def extend_batch(  # pylint: disable=unused-argument
+    request: Request,
+    response: Response,
+    payload: ExtendBatchRequest,
+    db_session: AsyncSession = Depends(get_session),
+) -> LinkBatchResponse:
+    links = await extend_links(db_session, payload.codes, payload.lifetime)  # One statement for all codes
+    READS.remember(response, *links)
+
+    return LinkBatchResponse(
+        found={code: populate_response_schema(link=link) for code, link in links.items()},
+        missing=[code for code in dict.fromkeys(payload.codes) if code not in links],
+    )
 
-    return populate_response_schema(link=link)
+
+@router.get(
+    "/clicks/{code}",
+    summary="Extracts daily click counts of a link.",
+    tags=["Management"],
+    response_model=ClickSeries,
+    status_code=status.HTTP_200_OK,
+    responses={
+        status.HTTP_404_NOT_FOUND: {"description": "There's no `link` assigned to this code."},
+    },
+)
+async def clicks(  # pylint: disable=unused-argument
+    request: Request,
+    code: str,
+    since: date | None = None,
+    until: date | None = None,
+    db_session: AsyncSession = Depends(get_session),
+) -> ClickSeries:
+    # Counts still buffered in the workers show up after their next flush.
+    if await db_session.scalar(select(func.count()).select_from(Link).where(Link.code == code)) == 0:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="There's no `link` assigned to this code.")
+
+    statement = select(Click.day, Click.count).where(Click.code == code).order_by(Click.day)
+    if since is not None:
+        statement = statement.where(Click.day >= since)
+    if until is not None:
+        statement = statement.where(Click.day <= until)
+
+    days = [ClickDay(day=day, count=count) for day, count in await db_session.execute(statement)]
+    return ClickSeries(total=sum(day.count for day in days), days=days)
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Request, status
+from fastapi.responses import PlainTextResponse
+
+from source.database.connection import ENGINE, REPLICA_ENGINE, pool_stats
+from source.utils.allocator import RESERVOIR
+from source.utils.bloom import CODE_FILTER
+from source.utils.metrics import METRICS, Metrics
+
+router = APIRouter()
+
+
+def collect_pools(registry: Metrics) -> None:
+    for database, engine in (("primary", ENGINE), ("replica", REPLICA_ENGINE)):
+        if engine is not None:
+            for state, value in pool_stats(engine).items():
+                registry.set("turl_db_pool_connections", value, database=database, state=state)
+
+
+def collect_code_filter(registry: Metrics) -> None:
+    if (stats := CODE_FILTER.stats())["ready"]:
+        registry.set("turl_code_filter_codes", stats["codes"])
+        registry.set("turl_code_filter_false_positive_rate", stats["false_positive_rate"])
+
+
+def collect_code_reservoir(registry: Metrics) -> None:
+    for length, depth in RESERVOIR.depths().items():
+        registry.set("turl_code_reservoir_codes", depth, length=str(length))
+
+
+METRICS.collectors += [collect_pools, collect_code_filter, collect_code_reservoir]
+
+
+@router.get(
+    "/metrics",
+    summary="Exposes the metrics of all workers in the Prometheus text format.",
+    tags=["Monitoring"],
+    response_class=PlainTextResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def metrics(request: Request) -> PlainTextResponse:  # pylint: disable=unused-argument
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
@@ -1,8 +1,53 @@
 from fastapi import APIRouter, Response, status
+from pydantic import BaseModel
+
+from source.database.connection import ENGINE, REPLICA_ENGINE, pool_stats
+from source.utils.admission import ADMISSION
+from source.utils.bloom import CODE_FILTER
 
 router = APIRouter()
 
 
+class PoolStatus(BaseModel):
+    primary: dict[str, int]
+    replica: dict[str, int] | None
+    admission: dict[str, float]
+
+
+class CodeFilterStatus(BaseModel):
+    ready: bool
+    trusted: bool  # misses are answered without the database
+    codes: int
+    bits: int
+    hashes: int
+    false_positive_rate: float
+    stale: int  # deleted codes still in the filter
+
+
 @router.get("/status", status_code=status.HTTP_200_OK)
 async def get_status() -> Response:
     return Response(status_code=status.HTTP_200_OK)
+
+
+@router.get(
+    "/status/pool",
+    summary="Reports the database pools and the admission queue of this worker.",
+    response_model=PoolStatus,
+    status_code=status.HTTP_200_OK,
+)
+async def get_pool_status() -> PoolStatus:
+    return PoolStatus(
+        primary=pool_stats(ENGINE),
+        replica=pool_stats(REPLICA_ENGINE) if REPLICA_ENGINE is not None else None,
+        admission=ADMISSION.stats(),
+    )
+
+
+@router.get(
+    "/status/filter",
+    summary="Reports the size and false positive rate of the code filter of this worker.",
+    response_model=CodeFilterStatus,
+    status_code=status.HTTP_200_OK,
+)
+async def get_filter_status() -> CodeFilterStatus:
+    return CodeFilterStatus.model_validate(CODE_FILTER.stats())
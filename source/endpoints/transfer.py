@@ -0,0 +1,70 @@
+from datetime import date
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Query, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from source.database.connection import get_engine
+from source.utils.transfer import export_links, export_statement, import_links, iterate_lines
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+router = APIRouter()
+
+
+class ImportResponse(BaseModel):
+    imported: int
+    rejected: int
+    seconds: float
+    rows_per_second: float
+    errors: list[str]
+
+
+@router.post(
+    "/import",
+    summary="Imports links in bulk from a NDJSON or CSV stream.",
+    tags=["Transfer"],
+    response_model=ImportResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def bulk_import(
+    request: Request,
+    file_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    engine: AsyncEngine = Depends(get_engine),
+) -> ImportResponse:
+    # Rows are `{"url": ..., "code": ..., "lifetime": ...}` objects or `url,code,lifetime` lines (header optional).
+    report = await import_links(engine=engine, lines=iterate_lines(request.stream()), file_format=file_format)
+
+    return ImportResponse(
+        imported=report.imported,
+        rejected=report.rejected,
+        seconds=report.seconds,
+        rows_per_second=report.rows_per_second,
+        errors=report.errors,
+    )
+
+
+@router.get(
+    "/export",
+    summary="Streams all links as NDJSON or CSV.",
+    tags=["Transfer"],
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def bulk_export(  # pylint: disable=too-many-arguments, too-many-positional-arguments
+    request: Request,  # pylint: disable=unused-argument
+    file_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    expired: bool | None = None,
+    registered_from: date | None = None,
+    registered_to: date | None = None,
+    engine: AsyncEngine = Depends(get_engine),
+) -> StreamingResponse:
+    statement = export_statement(expired=expired, registered_from=registered_from, registered_to=registered_to)
+
+    return StreamingResponse(
+        export_links(engine=engine, statement=statement, file_format=file_format),
+        media_type=MEDIA_TYPES[file_format],
+        headers={"content-disposition": f'attachment; filename="links.{file_format}"'},
+    )
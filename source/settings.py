@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -12,8 +14,97 @@ class Settings(BaseSettings):
     database_url: str
     cors_origins: str
 
+    # Rate limiting (per client token buckets refilled over `rate_limit_window_seconds`)
+    rate_limit_redirect_requests: int | None = None  # `/d/{code}`, defaults to `rate_limit_requests`
+    rate_limit_encode_requests: int | None = None  # `/encode`, defaults to `rate_limit_requests`
+    rate_limit_management_requests: int | None = None  # `/info`, `/extend`, `/import`, ... defaults as above
+    rate_limit_exempt_paths: list[str] = ["/status", "/metrics"]
+    rate_limit_max_clients: int = 100_000  # buckets kept per worker (or slots of the shared table)
+    rate_limit_backend: Literal["memory", "shared"] = "memory"  # "shared" enforces limits across all workers of a host
+    rate_limit_shared_path: str = "/dev/shm/turl-rate-limit"
+
+    # Database pool (per worker and database)
+    pool_size: int = 5  # persistent connections
+    pool_max_overflow: int = 10  # extra connections opened temporarily while all persistent ones are busy
+    pool_recycle_seconds: int = 300  # connections older than this are replaced before reuse
+    pool_pre_ping: bool = True  # validates connections on checkout at the cost of a round trip
+    pool_timeout_seconds: float = 30  # how long a checkout may wait before it fails
+    admission_wait_seconds: float = 0.5  # how long a request may queue for a connection before it gets a 503
+    admission_retry_after_seconds: int = 1
+
+    # Metrics
+    metrics_directory: str | None = None  # shared by all workers of a host (e.g. under /dev/shm) to aggregate them
+    metrics_flush_interval_seconds: float = 5  # how often every worker publishes its metrics there
+
+    # Read replica
+    replica_database_url: str | None = None  # serves redirects and `/info` when set
+    replica_connect_timeout_seconds: float = 2
+    replica_retry_seconds: float = 30  # how long reads stay on the primary after the replica failed
+    read_your_writes_seconds: float = 10  # how long reads of a written code (or by its writer) stay on the primary
+
+    # Lookups
+    lookup_backend: Literal["orm", "raw"] = "orm"  # "raw" serves redirects and `/info` from plain asyncpg pools
+    raw_pool_min_size: int = 1  # connections per raw pool (one pool per database)
+    raw_pool_max_size: int = 10
+
     # Custom settings
     max_code_generation_attempts: int = 10
+    max_batch_size: int = 1000  # items accepted by a single batch request
+    encode_group_commit: bool = False  # inserts concurrent `POST /encode` requests of a worker in one transaction
+    encode_group_commit_delay_seconds: float = 0.005  # longest a request waits for others to join its transaction
+    encode_group_commit_size: int = 100  # requests that commit at once without waiting longer
+    import_batch_size: int = 10_000  # rows copied per transaction during bulk imports
+    export_chunk_size: int = 10_000  # rows read per pooled connection checkout during exports
+
+    # Expiry
+    sweep_interval_seconds: float = 3600  # how often expired links are deleted
+    sweep_batch_size: int = 1000  # links deleted per transaction
+    sweep_grace_days: int = 0  # days an expired link is kept (e.g. for `/info`) before it is deleted
+
+    # Click analytics
+    analytics_flush_interval_seconds: float = 10  # how often in-memory click counts are written to the database
+
+    # Code allocation
+    code_secret: str = "tURL"  # keys the permutation that makes sequential codes look random
+    code_block_size: int = 100  # counter values each worker reserves per database round trip
+    code_reservoir_lengths: list[int] = [5, 6, 7, 8]  # lengths whose codes are allocated ahead of `encode`
+    code_reservoir_low: int = 50  # codes per length left that trigger a refill
+    # Codes per length a refill tops up to. A worker that exits abandons whatever is left, so every restart may waste up
+    # to `code_reservoir_high` codes of each of `code_reservoir_lengths` (1000 with the defaults, on top of the unused
+    # rest of its counter blocks), keep it near the encodes per length expected between two refills
+    code_reservoir_high: int = 250
+    code_reservoir_refill_seconds: float = 0.5
+
+    # Redirects
+    redirect_fast_path: bool = True  # serves `GET /d/{code}` from a bare ASGI handler in front of the routing
+    redirect_status: Literal[301, 302, 307, 308] = 308  # permanent ones are also cached by browsers
+    redirect_max_age_seconds: int = 3600  # longest a shared cache keeps a redirect, capped by the link's expiry
+    redirect_coalescing: bool = True  # one lookup per uncached code at a time, concurrent redirects share its result
+    redirect_coalescing_timeout_seconds: float = 2  # longest a redirect waits for another's lookup before a 503
+
+    # Code filter (Bloom filter of existing codes per worker)
+    code_filter_enabled: bool = True
+    code_filter_capacity: int = 1_000_000  # codes the filter is sized for at least, rebuilt larger if the table grows
+    code_filter_error_rate: float = 0.01  # target false positive rate
+    code_filter_sync_seconds: float = 1  # backstop for notifications lost while the invalidation listener reconnects
+    code_filter_sync_overlap: int = 30  # syncs whose rows are read again, as inserts commit out of id order
+
+    # Invalidation bus (Postgres LISTEN/NOTIFY between workers)
+    invalidation_enabled: bool = True
+    invalidation_channel: str = "turl_invalidation"
+    invalidation_keepalive_seconds: float = 10  # how soon a broken listener connection is noticed
+    invalidation_retry_seconds: float = 1  # first reconnect delay, doubled up to 30 seconds
+
+    # Shared hot-link table (memory-mapped, read by all workers of a host)
+    shared_links_path: str | None = None  # e.g. /dev/shm/turl-links, unset disables the table
+    shared_links_slots: int = 65_536  # filled to at most half with the most clicked links
+    shared_links_url_bytes: int = 512  # longer URLs are not shared
+    shared_links_refresh_seconds: float = 30
+
+    # Redirect cache
+    cache_size: int = 10_000  # maximum number of cached codes per worker (0 disables caching)
+    cache_ttl_seconds: float = 300
+    cache_negative_ttl_seconds: float = 5  # unknown codes are remembered briefly to shield the database from scanners
 
 
 settings = Settings()
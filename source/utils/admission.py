@@ -0,0 +1,78 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException, status
+
+from source.settings import settings
+from source.utils.metrics import METRICS
+
+
+class Admission:  # pylint: disable=too-many-instance-attributes
+    # Caps the requests using the database at once to the connections the pool can hand out. Others queue for at most
+    # `wait` seconds and are then turned away with a 503, instead of piling up until the pool timeout.
+    def __init__(self, limit: int, wait: float, retry_after: int) -> None:
+        self.limit = limit
+        self.wait = wait
+        self.retry_after = retry_after
+        self.reset()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        started = time.perf_counter()
+
+        self.waiting += 1
+        try:
+            async with asyncio.timeout(self.wait):
+                await self._semaphore.acquire()
+        except TimeoutError:
+            self.rejected += 1
+            METRICS.inc("turl_admission_rejections_total")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="The service is saturated. Try again shortly.",
+                headers={"Retry-After": str(self.retry_after)},
+            ) from None
+        finally:
+            self.waiting -= 1
+
+        self.admitted += 1
+        self.wait_seconds += time.perf_counter() - started
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    async def __call__(self) -> AsyncIterator[None]:
+        # Dependency holding a slot for the whole request.
+        async with self.slot():
+            yield
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "wait_seconds": round(self.wait_seconds, 6),
+        }
+
+    def reset(self) -> None:
+        self._semaphore = asyncio.Semaphore(self.limit)
+
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+
+
+ADMISSION = Admission(
+    limit=settings.pool_size + settings.pool_max_overflow,
+    wait=settings.admission_wait_seconds,
+    retry_after=settings.admission_retry_after_seconds,
+)
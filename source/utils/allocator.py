@@ -0,0 +1,126 @@
+import asyncio
+from collections import defaultdict, deque
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from source.database.models import Counter, Link
+from source.settings import settings
+from source.utils.functions import ALPHABET, code
+from source.utils.metrics import METRICS
+
+
+class CodeSpaceExhaustedError(Exception):
+    pass
+
+
+class CodeAllocator:
+    # Hands out codes derived from a per-length counter. Each worker reserves blocks of counter values in their own
+    # committed transaction, so a value is never handed out twice even if the insert using it is rolled back.
+    def __init__(self, block_size: int) -> None:
+        self.block_size = block_size
+
+        self._blocks: dict[int, range] = {}
+        self._locks: defaultdict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    async def allocate(self, engine: AsyncEngine, length: int) -> str:
+        if not (codes := await self.allocate_many(engine=engine, length=length, count=1)):
+            raise CodeSpaceExhaustedError(f"All codes of length {length} have been allocated.")
+        return codes[0]
+
+    async def allocate_many(self, engine: AsyncEngine, length: int, count: int) -> list[str]:
+        # Returns fewer codes than requested only when the code space of this length is used up.
+        numbers: list[int] = []
+
+        async with self._locks[length]:
+            block = self._blocks.get(length, range(0))
+
+            while len(numbers) < count:
+                if not block:
+                    try:
+                        block = await self._reserve(engine, length, size=max(self.block_size, count - len(numbers)))
+                    except CodeSpaceExhaustedError:
+                        break
+
+                taken = block[: count - len(numbers)]
+                numbers.extend(taken)
+                block = block[len(taken) :]
+
+            self._blocks[length] = block
+
+        return [code(number=number, length=length) for number in numbers]
+
+    async def _reserve(self, engine: AsyncEngine, length: int, size: int) -> range:
+        statement = (
+            insert(Counter)
+            .values(length=length, value=size)
+            .on_conflict_do_update(index_elements=[Counter.length], set_={"value": Counter.value + size})
+            .returning(Counter.value)
+        )
+
+        async with engine.begin() as connection:
+            stop = (await connection.execute(statement)).scalar_one()
+
+        domain = len(ALPHABET) ** length
+        start = stop - size
+        if start >= domain:
+            raise CodeSpaceExhaustedError(f"All codes of length {length} have been allocated.")
+
+        return range(start, min(stop, domain))
+
+    def reset(self) -> None:
+        self._blocks.clear()
+        self._locks.clear()
+
+
+class CodeReservoir:
+    # Codes of the commonly requested lengths, allocated ahead of `encode` and checked against `link` in bulk, so that
+    # encode pops one that is free (unless imported since) without touching the counter. A background refill tops a
+    # length up to `high` codes once fewer than `low` are left; an empty reservoir falls back to the allocator. Codes
+    # still reserved when the worker exits are never used, like the rest of its counter blocks.
+    def __init__(self, allocator: CodeAllocator, lengths: list[int], low: int, high: int) -> None:
+        self.allocator = allocator
+        self.lengths = lengths
+        self.low = low
+        self.high = high
+
+        self.reset()
+
+    def reset(self) -> None:
+        self._codes: dict[int, deque[str]] = {length: deque() for length in self.lengths}
+
+    def take_many(self, length: int, count: int) -> list[str]:
+        # Up to `count` codes, fewer when the reservoir of this length runs low or there is none.
+        if (codes := self._codes.get(length)) is None:
+            return []
+
+        taken = [codes.popleft() for _ in range(min(count, len(codes)))]
+        if len(taken) < count:
+            METRICS.inc("turl_code_reservoir_misses_total", count - len(taken), length=str(length))
+        return taken
+
+    def take(self, length: int) -> str | None:
+        return next(iter(self.take_many(length, 1)), None)
+
+    async def refill(self, engine: AsyncEngine) -> None:
+        for length, codes in self._codes.items():
+            if len(codes) >= self.low:
+                continue
+
+            candidates = await self.allocator.allocate_many(engine=engine, length=length, count=self.high - len(codes))
+            async with engine.connect() as connection:
+                taken = set(await connection.scalars(select(Link.code).where(Link.code.in_(candidates))))
+            codes.extend(candidate for candidate in candidates if candidate not in taken)
+
+    def depths(self) -> dict[int, int]:
+        return {length: len(codes) for length, codes in self._codes.items()}
+
+
+ALLOCATOR = CodeAllocator(block_size=settings.code_block_size)
+RESERVOIR = CodeReservoir(
+    allocator=ALLOCATOR,
+    lengths=settings.code_reservoir_lengths,
+    low=settings.code_reservoir_low,
+    high=settings.code_reservoir_high,
+)
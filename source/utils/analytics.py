@@ -0,0 +1,51 @@
+from collections import defaultdict
+from datetime import date
+from itertools import batched
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from source.database.models import Click
+
+FLUSH_CHUNK_SIZE = 5000  # rows per upsert, keeps statements well below the bind parameter limit
+
+
+class ClickCounter:
+    # Counts redirects in memory so the redirect path never writes to the database. Counts are periodically
+    # flushed in batched upserts into the per-code per-day `click` rollup.
+    def __init__(self) -> None:
+        self._counts: defaultdict[tuple[str, date], int] = defaultdict(int)
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def record(self, code: str) -> None:
+        self._counts[(code, date.today())] += 1
+
+    async def flush(self, engine: AsyncEngine) -> int:
+        if not self._counts:
+            return 0
+
+        counts, self._counts = self._counts, defaultdict(int)
+        rows = [{"code": code, "day": day, "count": count} for (code, day), count in counts.items()]
+
+        try:
+            async with engine.begin() as connection:
+                for chunk in batched(rows, FLUSH_CHUNK_SIZE):
+                    statement = insert(Click).values(chunk)
+                    statement = statement.on_conflict_do_update(
+                        index_elements=[Click.code, Click.day], set_={"count": Click.count + statement.excluded.count}
+                    )
+                    await connection.execute(statement)
+        except BaseException:  # Cancellation too, the final flush at shutdown must still find them
+            for key, count in counts.items():  # Keeps the counts for the next flush
+                self._counts[key] += count
+            raise
+
+        return len(rows)
+
+    def clear(self) -> None:
+        self._counts.clear()
+
+
+CLICKS = ClickCounter()
@@ -0,0 +1,96 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+
+from source.utils.metrics import METRICS
+
+
+class GroupCommit[K: Hashable, T, R]:
+    # Collects the items submitted concurrently under the same key and hands them to `flush` at once, when `size` of
+    # them are waiting or the first has waited `delay` seconds. `flush` returns one result per item, in order, and each
+    # submitter awaits its own; if `flush` fails they all get the error. A submitter that gives up does not withdraw its
+    # item, which is written regardless.
+    def __init__(self, flush: Callable[[K, list[T]], Awaitable[list[R]]], delay: float, size: int) -> None:
+        self.flush = flush
+        self.delay = delay
+        self.size = size
+
+        self._pending: dict[K, list[tuple[T, asyncio.Future[R]]]] = {}
+        self._timers: dict[K, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task[None]] = set()  # keeps running flushes referenced
+
+    async def submit(self, key: K, item: T) -> R:
+        future: asyncio.Future[R] = asyncio.get_running_loop().create_future()
+        group = self._pending.setdefault(key, [])
+        group.append((item, future))
+
+        if len(group) >= self.size:
+            self._start(key)
+        elif len(group) == 1:
+            self._timers[key] = asyncio.get_running_loop().call_later(self.delay, self._start, key)
+
+        return await future
+
+    def _start(self, key: K) -> None:
+        if (timer := self._timers.pop(key, None)) is not None:
+            timer.cancel()
+        if group := self._pending.pop(key, []):
+            task = asyncio.create_task(self._flush(key, group))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self, key: K, group: list[tuple[T, asyncio.Future[R]]]) -> None:
+        METRICS.inc("turl_group_commits_total")
+        METRICS.inc("turl_group_commit_items_total", len(group))
+
+        try:
+            results = await self.flush(key, [item for item, _ in group])
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            for _, future in group:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for (_, future), result in zip(group, results, strict=True):
+            if not future.done():
+                future.set_result(result)
+
+
+class AbandonedError(Exception):
+    pass
+
+
+class SingleFlight[K: Hashable, R]:
+    # Runs at most one call per key at a time: callers arriving while one is in flight wait up to `timeout` seconds for
+    # its result, or its error, instead of making their own. The first caller runs it itself, so whatever it borrowed
+    # for the call stays valid; if it is cancelled, those waiting try again on their own.
+    def __init__(self, timeout: float, enabled: bool = True) -> None:
+        self.timeout = timeout
+        self.enabled = enabled
+
+        self._flights: dict[K, asyncio.Future[R]] = {}
+
+    async def run(self, key: K, function: Callable[[], Awaitable[R]]) -> R:
+        if not self.enabled:
+            return await function()
+
+        if key in self._flights:
+            METRICS.inc("turl_coalesced_requests_total")
+        while (flight := self._flights.get(key)) is not None:
+            async with asyncio.timeout(self.timeout):
+                try:
+                    return await asyncio.shield(flight)
+                except AbandonedError:
+                    continue
+
+        flight = self._flights[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await function()
+        except (asyncio.CancelledError, Exception) as error:
+            flight.set_exception(error if isinstance(error, Exception) else AbandonedError())
+            flight.exception()  # Marks it retrieved, nobody may be waiting
+            raise
+        finally:
+            del self._flights[key]
+
+        flight.set_result(result)
+        return result
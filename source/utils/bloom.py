@@ -0,0 +1,160 @@
+import math
+import time
+from collections import deque
+from hashlib import blake2b
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from source.database.models import Link
+from source.settings import settings
+
+SCAN_BATCH_SIZE = 10_000  # rows fetched per round trip of the streaming scan
+
+
+class BloomFilter:
+    # Fixed-size bit array with `hashes` probes per item, derived from one 128-bit digest (Kirsch-Mitzenmacher).
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))  # bits
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0  # items that set at least one new bit, close to the number of distinct items
+        self.filled = 0  # bits set
+
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> list[int]:
+        digest = blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8]), int.from_bytes(digest[8:]) | 1
+        return [(first + index * second) % self.size for index in range(self.hashes)]
+
+    def add(self, item: str) -> None:
+        filled = self.filled
+        for position in self._positions(item):
+            if not self._bits[position >> 3] & (mask := 1 << (position & 7)):
+                self._bits[position >> 3] |= mask
+                self.filled += 1
+        self.count += self.filled > filled
+
+    def __contains__(self, item: object) -> bool:
+        return isinstance(item, str) and all(
+            self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item)
+        )
+
+    def false_positive_rate(self) -> float:
+        # Rate at the current fill, which exceeds the target once more than `capacity` items are added.
+        return (self.filled / self.size) ** self.hashes
+
+
+class CodeFilter:  # pylint: disable=too-many-instance-attributes
+    # Bloom filter of every code in `link`, so that redirects of codes that certainly do not exist are answered without
+    # the database. Until the first scan completes it knows nothing and every code may exist. Codes inserted by this
+    # worker are added right away, those of other workers when the invalidation listener receives their "created"
+    # notification, which Postgres sends on commit. The periodic `sync` is the backstop for notifications lost while
+    # the listener was disconnected: it reads the rows past an id watermark and trails by `overlap` syncs, as ids are
+    # assigned at insert and transactions may commit out of their order. Misses are only trusted while the listener is
+    # connected and a sync completed since it (re)connected, so another worker's code is missing for no longer than its
+    # notification takes to arrive; without invalidation every code may exist. Deleted codes cannot be removed from a
+    # Bloom filter, they only raise its false positive rate until the next rebuild.
+    def __init__(self, enabled: bool, capacity: int, error_rate: float, overlap: int) -> None:
+        self.enabled = enabled
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.overlap = overlap
+
+        self.reset()
+
+    def reset(self) -> None:
+        self._bloom: BloomFilter | None = None
+        self._building: BloomFilter | None = None
+        self._marks: deque[int] = deque([0], maxlen=self.overlap)
+        self._synced_from = -math.inf  # when the last completed scan or sync started (monotonic)
+
+        self.stale = 0
+        self.listening_since: float | None = None  # set by the invalidation listener while it is connected
+
+    def may_exist(self, code: str) -> bool:
+        return self._bloom is None or code in self._bloom
+
+    def trusted(self) -> bool:
+        return (
+            self._bloom is not None and self.listening_since is not None and self.listening_since <= self._synced_from
+        )
+
+    def rejects(self, code: str) -> bool:
+        # Whether the code certainly does not exist, and may be answered without the database.
+        return self.trusted() and not self.may_exist(code)
+
+    def add(self, *codes: str) -> None:
+        for bloom in (self._bloom, self._building):
+            if bloom is not None:
+                for code in codes:
+                    bloom.add(code)
+
+    def discard(self, count: int) -> None:
+        # Records codes deleted from `link`; they stay in the filter until the next rebuild.
+        self.stale += count
+
+    def needs_rebuild(self) -> bool:
+        if self._bloom is None:
+            return True
+        return self.stale > self._bloom.count // 2 or self._bloom.false_positive_rate() > 2 * self.error_rate
+
+    async def refresh(self, engine: AsyncEngine) -> None:
+        if not self.enabled:
+            return
+        if self.needs_rebuild():
+            await self.build(engine)
+        else:
+            await self.sync(engine)
+
+    async def build(self, engine: AsyncEngine) -> None:
+        # Scans all codes with a server-side cursor into a new filter, while the current one keeps answering.
+        started = time.monotonic()
+        async with engine.connect() as connection:
+            rows = await connection.scalar(select(func.count()).select_from(Link)) or 0
+            self._building = BloomFilter(capacity=max(self.capacity, 2 * rows), error_rate=self.error_rate)
+
+            try:
+                watermark = 0
+                result = await connection.stream(
+                    select(Link.id, Link.code).execution_options(yield_per=SCAN_BATCH_SIZE)
+                )
+                async for partition in result.partitions():
+                    for link_id, code in partition:
+                        self._building.add(code)
+                        watermark = max(watermark, link_id)
+
+                self._bloom, self.stale = self._building, 0
+                self._marks = deque([watermark], maxlen=self.overlap)
+                self._synced_from = started
+            finally:
+                self._building = None
+
+    async def sync(self, engine: AsyncEngine) -> None:
+        started = time.monotonic()
+        async with engine.connect() as connection:
+            rows = (await connection.execute(select(Link.id, Link.code).where(Link.id > self._marks[0]))).all()
+
+        self.add(*(code for _, code in rows))
+        self._marks.append(max((link_id for link_id, _ in rows), default=self._marks[-1]))
+        self._synced_from = started
+
+    def stats(self) -> dict[str, float]:
+        bloom = self._bloom
+        return {
+            "ready": int(bloom is not None),
+            "trusted": int(self.trusted()),
+            "codes": bloom.count if bloom is not None else 0,
+            "bits": bloom.size if bloom is not None else 0,
+            "hashes": bloom.hashes if bloom is not None else 0,
+            "false_positive_rate": round(bloom.false_positive_rate(), 6) if bloom is not None else 1,
+            "stale": self.stale,
+        }
+
+
+CODE_FILTER = CodeFilter(
+    enabled=settings.code_filter_enabled,
+    capacity=settings.code_filter_capacity,
+    error_rate=settings.code_filter_error_rate,
+    overlap=settings.code_filter_sync_overlap,
+)
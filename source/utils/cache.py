@@ -0,0 +1,77 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+
+from source.settings import settings
+from source.utils.functions import seconds_left
+
+
+@dataclass(slots=True)
+class CacheEntry:
+    url: str | None  # empty means the code is known not to exist (negative entry)
+    expires_at: date | None
+    deadline: float
+
+
+class LinkCache:  # Bounded LRU mapping of codes to URLs whose entries also expire after a TTL
+    def __init__(self, size: int, ttl: float, negative_ttl: float) -> None:
+        self.size = size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, code: str) -> CacheEntry | None:
+        entry = self._entries.get(code)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if entry.deadline <= time.monotonic():
+            del self._entries[code]
+            self.evictions += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(code)
+        self.hits += 1
+        return entry
+
+    def set(self, code: str, url: str | None, expires_at: date | None = None) -> None:
+        if self.size <= 0:
+            return
+
+        ttl = self.ttl if url is not None else self.negative_ttl
+        if expires_at is not None:  # Links stay active through their expiry date, entries must not outlive that
+            ttl = min(ttl, seconds_left(expires_at))
+
+        self._entries[code] = CacheEntry(url=url, expires_at=expires_at, deadline=time.monotonic() + ttl)
+        self._entries.move_to_end(code)
+
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, *codes: str) -> None:
+        for code in codes:
+            self._entries.pop(code, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {"size": len(self), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+CACHE = LinkCache(
+    size=settings.cache_size, ttl=settings.cache_ttl_seconds, negative_ttl=settings.cache_negative_ttl_seconds
+)
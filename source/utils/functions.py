@@ -1,6 +1,64 @@
-from random import sample
+from datetime import date, datetime, timedelta
+from hashlib import blake2b
 from string import ascii_letters, digits
+from urllib.parse import urlsplit, urlunsplit
 
+from source.settings import settings
 
-def code(length: int) -> str:
-    return "".join(sample(ascii_letters + digits, length))
+ALPHABET = digits + ascii_letters
+FEISTEL_ROUNDS = 4
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def base62(number: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        number, remainder = divmod(number, len(ALPHABET))
+        chars.append(ALPHABET[remainder])
+    return "".join(reversed(chars))
+
+
+def permute(number: int, domain: int, key: bytes) -> int:
+    # Keyed Feistel network over the smallest even bit width covering the domain. Cycle walking keeps the result
+    # inside the domain, so this is a bijection on [0, domain) and distinct numbers always yield distinct results.
+    half = max((domain - 1).bit_length() + 1, 2) // 2
+    mask = (1 << half) - 1
+    size = (half + 7) // 8
+
+    while True:
+        left, right = number >> half, number & mask
+        for index in range(FEISTEL_ROUNDS):
+            digest = blake2b(right.to_bytes(size) + index.to_bytes(1), key=key, digest_size=min(size, 64)).digest()
+            left, right = right, left ^ (int.from_bytes(digest) & mask)
+        number = (left << half) | right
+
+        if number < domain:
+            return number
+
+
+def code(number: int, length: int) -> str:
+    key = blake2b(settings.code_secret.encode(), digest_size=32).digest()
+    return base62(permute(number, len(ALPHABET) ** length, key), length)
+
+
+def normalize(url: str) -> str:
+    # Spells equivalent URLs the same way: lowercase scheme and host, no default port and at least the root path.
+    parts = urlsplit(url.strip())
+    scheme, host = parts.scheme.lower(), (parts.hostname or "").lower()
+
+    netloc = f"[{host}]" if ":" in host else host
+    if userinfo := parts.netloc.rpartition("@")[0]:
+        netloc = f"{userinfo}@{netloc}"
+    if parts.port is not None and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{parts.port}"
+
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, parts.fragment))
+
+
+def fingerprint(url: str) -> bytes:
+    return blake2b(normalize(url).encode(), digest_size=16).digest()
+
+
+def seconds_left(expires_at: date) -> float:
+    # Links stay active through their expiry date, i.e. until the following midnight.
+    return (datetime.combine(expires_at + timedelta(days=1), datetime.min.time()) - datetime.now()).total_seconds()
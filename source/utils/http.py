@@ -0,0 +1,40 @@
+from collections.abc import Mapping
+from datetime import UTC, date, datetime, time
+from email.utils import format_datetime, parsedate_to_datetime
+from hashlib import blake2b
+
+from source.settings import settings
+from source.utils.functions import seconds_left
+
+
+def redirect_cache_control(expires_at: date | None) -> str:
+    # Shared caches may keep a redirect until the link expires, but at most `redirect_max_age_seconds`, so that
+    # extending or revoking a link still reaches them.
+    max_age = settings.redirect_max_age_seconds
+    if expires_at is not None:
+        max_age = min(max_age, int(seconds_left(expires_at)))
+    return f"public, max-age={max(max_age, 0)}"
+
+
+def entity_tag(content: bytes) -> str:
+    return f'W/"{blake2b(content, digest_size=12).hexdigest()}"'
+
+
+def http_date(day: date) -> str:
+    return format_datetime(datetime.combine(day, time.min, tzinfo=UTC), usegmt=True)
+
+
+def not_modified(headers: Mapping[str, str], etag: str, last_modified: date) -> bool:
+    # Conditional GET as in RFC 9110: `If-None-Match` (weak comparison) takes precedence over `If-Modified-Since`.
+    if (candidates := headers.get("if-none-match")) is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in candidates.split(",")}
+        return "*" in tags or etag.removeprefix("W/") in tags
+
+    # Modification dates are days, so a link changed today may change again without `Last-Modified` moving.
+    if (since := headers.get("if-modified-since")) is not None and last_modified < date.today():
+        try:
+            return datetime.combine(last_modified, time.min, tzinfo=UTC) <= parsedate_to_datetime(since)
+        except (TypeError, ValueError):
+            return False  # Malformed dates are ignored
+
+    return False
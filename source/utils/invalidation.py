@@ -0,0 +1,124 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections.abc import Callable, Iterable
+from typing import Any, Literal
+
+import asyncpg
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+from source.settings import settings
+from source.utils.bloom import CODE_FILTER
+from source.utils.cache import CACHE
+from source.utils.metrics import METRICS
+from source.utils.shared import SHARED_LINKS
+
+logger = logging.getLogger(__name__)
+
+Change = Literal["created", "changed", "deleted"]
+
+ORIGIN = uuid.uuid4().hex  # tells this worker's own notifications apart, pids repeat across hosts
+MAX_PAYLOAD = 7900  # bytes, Postgres rejects notification payloads of 8000 and more
+
+
+def payloads(change: Change, codes: Iterable[str]) -> list[str]:
+    # As few payloads as fit the codes, each carrying the time it was written at for the lag metric.
+    def payload(chunk: list[str]) -> str:
+        return json.dumps({"origin": ORIGIN, "change": change, "sent": time.time(), "codes": chunk})
+
+    chunks: list[list[str]] = [[]]
+    size = len(payload([]))
+    for code in codes:
+        item = len(json.dumps(code)) + 2  # quoted, and separated from the previous one
+        if chunks[-1] and size + item > MAX_PAYLOAD:
+            chunks.append([])
+            size = len(payload([]))
+        chunks[-1].append(code)
+        size += item
+
+    return [payload(chunk) for chunk in chunks if chunk]
+
+
+def notifications(change: Change, codes: Iterable[str]) -> list[str]:
+    # The payloads to send for a change, none while invalidation is disabled.
+    return payloads(change, codes) if settings.invalidation_enabled else []
+
+
+async def publish(executor: AsyncConnection | AsyncSession, change: Change, codes: Iterable[str]) -> None:
+    # Must run inside the transaction making the change: Postgres delivers the notifications on commit only, and
+    # drops them on rollback.
+    for payload in notifications(change, codes):
+        await executor.execute(select(func.pg_notify(settings.invalidation_channel, payload)))
+
+
+class Listener:
+    # Evicts the codes other workers changed from this worker's cache. Runs on a dedicated connection, as a pooled one
+    # would stop listening when returned. Notifications sent while disconnected are lost, so the whole cache is dropped
+    # on every (re)connect. Any error reconnects after a growing delay, unexpected ones are logged with their traceback.
+    def __init__(self, channel: str, keepalive: float, retry: float) -> None:
+        self.channel = channel
+        self.keepalive = keepalive
+        self.retry = retry
+
+    def receive(self, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+            origin, change, sent, codes = message["origin"], message["change"], message["sent"], message["codes"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring malformed invalidation %r.", payload)
+            return
+
+        METRICS.observe("turl_invalidation_lag_seconds", max(time.time() - sent, 0))
+        SHARED_LINKS.invalidate(*codes)  # Only the writer of the table evicts, for changes of any worker
+        if origin == ORIGIN:
+            return  # Applied already when the change was made
+
+        CACHE.invalidate(*codes)
+        if change == "created":
+            CODE_FILTER.add(*codes)
+        elif change == "deleted":
+            CODE_FILTER.discard(len(codes))
+        METRICS.inc("turl_invalidations_total", len(codes), change=change)
+
+    async def run(self, engine: AsyncEngine, connect: Callable[..., Any] = asyncpg.connect) -> None:
+        dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        delay = self.retry
+
+        while True:
+            connection = None
+            try:
+                connection = await connect(dsn)
+                await connection.add_listener(
+                    self.channel, lambda _connection, _pid, _channel, payload: self.receive(payload)
+                )
+
+                CACHE.clear()  # Resynchronizes, changes made while not listening went unnoticed
+                CODE_FILTER.listening_since = time.monotonic()  # Trusted again once a sync covers the gap
+                delay = self.retry
+
+                while True:  # Notices a broken connection, which asyncpg reports only on use
+                    await asyncio.sleep(self.keepalive)
+                    await connection.execute("SELECT 1")
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as error:
+                logger.warning("Invalidation listener disconnected (%s), reconnecting in %.0f s.", error, delay)
+                METRICS.inc("turl_invalidation_reconnects_total")
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Invalidation listener failed, reconnecting in %.0f s.", delay)
+                METRICS.inc("turl_invalidation_reconnects_total")
+            finally:
+                CODE_FILTER.listening_since = None
+                if connection is not None and not connection.is_closed():
+                    connection.terminate()
+
+            await asyncio.sleep(delay)
+            delay = min(2 * delay, 30)
+
+
+LISTENER = Listener(
+    channel=settings.invalidation_channel,
+    keepalive=settings.invalidation_keepalive_seconds,
+    retry=settings.invalidation_retry_seconds,
+)
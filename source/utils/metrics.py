@@ -0,0 +1,257 @@
+import fcntl
+import json
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from typing import Any, Literal
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from source.settings import settings
+
+Kind = Literal["counter", "gauge", "histogram"]
+Labels = tuple[tuple[str, str], ...]
+
+RETIRED = "retired"  # snapshot summing the counters of workers gone for a while
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DEFINITIONS: dict[str, tuple[Kind, str]] = {
+    "turl_requests_total": ("counter", "Requests served, by route, method and status code."),
+    "turl_request_duration_seconds": ("histogram", "Request latency, by route and method."),
+    "turl_db_query_duration_seconds": ("histogram", "Database statement latency, by database."),
+    "turl_db_pool_connections": ("gauge", "Pooled database connections, by database and state."),
+    "turl_encode_retries_total": ("counter", "Generated codes that collided and had to be regenerated."),
+    "turl_group_commits_total": ("counter", "Transactions inserting grouped encode requests."),
+    "turl_group_commit_items_total": ("counter", "Encode requests inserted in grouped transactions."),
+    "turl_code_reservoir_codes": ("gauge", "Codes allocated ahead of encode and not used yet, by length."),
+    "turl_code_reservoir_misses_total": ("counter", "Codes allocated inline as the reservoir ran dry, by length."),
+    "turl_rate_limit_rejections_total": ("counter", "Requests rejected by the rate limiter, by policy."),
+    "turl_admission_rejections_total": ("counter", "Requests rejected because the database pool was saturated."),
+    "turl_coalesced_requests_total": ("counter", "Redirects that shared the lookup of a concurrent one."),
+    "turl_coalescing_timeouts_total": ("counter", "Redirects that gave up waiting for a concurrent lookup."),
+    "turl_code_filter_rejections_total": ("counter", "Redirects answered with a 404 by the code filter alone."),
+    "turl_code_filter_misses_total": ("counter", "Redirected codes the code filter did not have yet."),
+    "turl_code_filter_codes": ("gauge", "Codes in the code filter."),
+    "turl_code_filter_false_positive_rate": ("gauge", "False positive rate of the code filter at its current fill."),
+    "turl_invalidations_total": ("counter", "Codes evicted on notice of other workers, by change."),
+    "turl_invalidation_lag_seconds": ("histogram", "Time from sending an invalidation to receiving it."),
+    "turl_invalidation_reconnects_total": ("counter", "Times the invalidation listener lost its connection."),
+}
+
+
+class Metrics:
+    # Plain per-worker counters; the event loop runs one callback at a time, so updates need no locks. Each worker
+    # publishes a snapshot to `directory` now and then, and a scrape of any worker sums the snapshots of all of them.
+    # Counters and histograms of exited workers keep counting (so totals never drop), their gauges are left out. Once a
+    # snapshot is `retire` seconds old, its counters are folded into a single one so that restarts do not pile up files.
+    def __init__(self, directory: str | None, stale: float, retire: float) -> None:
+        self.directory = Path(directory) if directory else None
+        self.stale = stale
+        self.retire = retire
+        self.collectors: list[Callable[[Metrics], None]] = []  # refresh gauges right before a snapshot
+
+        self.clear()
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        self._counters[name, tuple(labels.items())] += amount
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        self._gauges[name, tuple(labels.items())] = value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        # Bucket counts (non-cumulative, the last one is +Inf), then the sum and the count of observations.
+        if (series := self._histograms.get((name, tuple(labels.items())))) is None:
+            series = self._histograms[name, tuple(labels.items())] = [0.0] * (len(BUCKETS) + 3)
+
+        series[bisect_left(BUCKETS, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        for collector in self.collectors:
+            collector(self)
+
+        return {
+            "time": time.time(),
+            "counters": [[name, labels, value] for (name, labels), value in self._counters.items()],
+            "gauges": [[name, labels, value] for (name, labels), value in self._gauges.items()],
+            "histograms": [[name, labels, series] for (name, labels), series in self._histograms.items()],
+        }
+
+    async def publish(self) -> None:
+        # A few kilobytes written to a memory-backed directory, cheap enough to do on the event loop.
+        if self.directory is None:
+            return
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{os.getpid()}.json"
+        temporary = path.with_suffix(".tmp")
+        temporary.write_text(json.dumps(self.snapshot()))
+        temporary.replace(path)  # Readers never see a partial file
+        self.fold()
+
+    def fold(self) -> None:
+        # Sums the snapshots of exited workers into the retired one and removes them, one worker at a time.
+        if self.directory is None:
+            return
+
+        with (self.directory / f"{RETIRED}.lock").open("w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # Another worker is folding
+
+            retired = self.directory / f"{RETIRED}.json"  # Timed at 0, so it is always folded into itself
+            series: defaultdict[str, dict[Labels, Any]] = defaultdict(dict)
+            folded = []
+            for path in self.directory.glob("*.json"):
+                if path.stem == str(os.getpid()) or (snapshot := load(path)) is None:
+                    continue
+                if time.time() - snapshot["time"] > self.retire:
+                    merge(series, snapshot, gauges=False)
+                    folded.append(path)
+            if set(folded) <= {retired}:
+                return
+
+            total: dict[str, Any] = {"time": 0, "counters": [], "gauges": [], "histograms": []}
+            for name, values in series.items():
+                for labels, value in values.items():
+                    total["histograms" if isinstance(value, list) else "counters"].append([name, labels, value])
+            temporary = retired.with_suffix(".tmp")
+            temporary.write_text(json.dumps(total))
+            temporary.replace(retired)
+            for path in folded:
+                if path != retired:
+                    path.unlink()
+
+    def gather(self) -> Iterable[dict[str, Any]]:
+        snapshots = [self.snapshot()]  # This worker's is always fresh
+        if self.directory is None or not self.directory.exists():
+            return snapshots
+
+        for path in self.directory.glob("*.json"):
+            if path.stem != str(os.getpid()) and (snapshot := load(path)) is not None:
+                snapshots.append(snapshot)
+        return snapshots
+
+    def render(self) -> str:
+        now = time.time()
+        series: defaultdict[str, dict[Labels, Any]] = defaultdict(dict)
+
+        for snapshot in self.gather():
+            merge(series, snapshot, gauges=now - snapshot["time"] <= self.stale)
+
+        lines = []
+        for name, (kind, description) in DEFINITIONS.items():
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+            for labels, value in sorted(series.get(name, {}).items()):
+                if kind == "histogram":
+                    lines += render_histogram(name, labels, value)
+                else:
+                    lines.append(f"{name}{render_labels(labels)} {format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        self._counters: defaultdict[tuple[str, Labels], float] = defaultdict(float)
+        self._gauges: dict[tuple[str, Labels], float] = {}
+        self._histograms: dict[tuple[str, Labels], list[float]] = {}
+
+
+def load(path: Path) -> dict[str, Any] | None:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None  # Removed or replaced meanwhile
+
+
+def merge(series: defaultdict[str, dict[Labels, Any]], snapshot: dict[str, Any], gauges: bool) -> None:
+    for name, labels, value in snapshot["counters"] + (snapshot["gauges"] if gauges else []):
+        key = tuple(map(tuple, labels))
+        series[name][key] = series[name].get(key, 0) + value
+    for name, labels, values in snapshot["histograms"]:
+        key = tuple(map(tuple, labels))
+        merged = series[name].get(key) or [0.0] * len(values)
+        series[name][key] = [total + value for total, value in zip(merged, values, strict=True)]
+
+
+def format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels) + "}"
+
+
+def render_histogram(name: str, labels: Labels, values: list[float]) -> list[str]:
+    lines, cumulative = [], 0.0
+    for bound, count in zip([*map(str, BUCKETS), "+Inf"], values[:-2], strict=True):
+        cumulative += count
+        lines.append(f"{name}_bucket{render_labels((*labels, ('le', bound)))} {format_value(cumulative)}")
+
+    lines.append(f"{name}_sum{render_labels(labels)} {format_value(values[-2])}")
+    lines.append(f"{name}_count{render_labels(labels)} {format_value(values[-1])}")
+    return lines
+
+
+def instrument(engine: AsyncEngine, database: str) -> None:
+    # Times every statement the engine executes (raw asyncpg lookups are timed by `RawLookup` itself).
+    def before(conn: Any, *_: Any) -> None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def after(conn: Any, *_: Any) -> None:
+        started = conn.info["query_started"].pop()
+        METRICS.observe("turl_db_query_duration_seconds", time.perf_counter() - started, database=database)
+
+    def failed(context: Any) -> None:
+        if context.connection is not None and context.connection.info.get("query_started"):
+            context.connection.info["query_started"].pop()
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before)
+    event.listen(engine.sync_engine, "after_cursor_execute", after)
+    event.listen(engine.sync_engine, "handle_error", failed)
+
+
+class MetricsMiddleware:
+    # Pure ASGI middleware, so that timing a request costs two clock reads and a few dictionary updates.
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started, code = time.perf_counter(), 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal code
+            if message["type"] == "http.response.start":
+                code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")  # templates keep the label cardinality bounded
+            METRICS.inc("turl_requests_total", route=route, method=scope["method"], status=str(code))
+            METRICS.observe(
+                "turl_request_duration_seconds", time.perf_counter() - started, route=route, method=scope["method"]
+            )
+
+
+METRICS = Metrics(
+    directory=settings.metrics_directory,
+    stale=3 * settings.metrics_flush_interval_seconds,
+    retire=12 * settings.metrics_flush_interval_seconds,
+)
@@ -0,0 +1,196 @@
+import asyncio
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import date, timedelta
+from hashlib import blake2b
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from source.database.models import Click, Link
+from source.settings import settings
+from source.utils.cache import CacheEntry
+from source.utils.functions import seconds_left
+
+PROBES = 8  # slots a code may live in, starting at its home slot
+
+
+def fingerprint(code: str) -> int:
+    return int.from_bytes(blake2b(code.encode(), digest_size=8).digest()) or 1  # zero marks an empty slot
+
+
+class SharedLinkTable:  # pylint: disable=too-many-instance-attributes
+    # Hot links in a memory-mapped file (e.g. under /dev/shm) that all workers of a host read, so the hot set is held
+    # once per host and a new worker serves it from its first request. Open addressing over fixed-size slots: a code
+    # lives in one of the `PROBES` slots after its home slot. A single writer, whichever worker holds the `flock` of the
+    # lock file, fills the table from the click rollup; readers never lock. Every slot starts with a sequence number
+    # the writer makes odd while it rewrites the slot, so a reader that sees it odd or changed treats the code as a
+    # miss. Slot layout: sequence, code fingerprint, deadline (wall clock), expiry (ordinal, 0 for none), URL length.
+    # `refresh` stores off the event loop, in a thread; codes invalidated meanwhile are not written back from its rows.
+    HEADER = struct.Struct("=IQdiH")
+
+    def __init__(self, path: str | None, slots: int, url_bytes: int, ttl: float) -> None:
+        self.path = path
+        self.slots = slots
+        self.url_bytes = url_bytes
+        self.slot_size = self.HEADER.size + url_bytes
+        self.ttl = ttl  # entries not refreshed for this long are ignored, e.g. after the writer died
+
+        self.writer = False
+        self._memory: mmap.mmap | None = None
+        self._descriptor = self._lock = -1
+        self._guard = threading.Lock()  # between the storing thread and invalidations on the event loop
+        self._invalidated: set[str] | None = None  # codes invalidated during the running refresh
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def open(self) -> mmap.mmap:
+        if self._memory is None:
+            # The layout is part of the name, so that workers configured differently never share a file.
+            name = f"{self.path}-{self.slots}x{self.url_bytes}"
+            size = self.slots * self.slot_size
+
+            self._descriptor = os.open(name, os.O_RDWR | os.O_CREAT, 0o600)
+            if os.fstat(self._descriptor).st_size < size:
+                os.ftruncate(self._descriptor, size)
+            self._memory = mmap.mmap(self._descriptor, size)
+        return self._memory
+
+    def get(self, code: str) -> CacheEntry | None:
+        if not self.enabled:
+            return None
+
+        memory, owner = self.open(), fingerprint(code)
+        home = owner % self.slots
+        for probe in range(PROBES):
+            offset = (home + probe) % self.slots * self.slot_size
+            sequence, found, deadline, expires, length = self.HEADER.unpack_from(memory, offset)
+            if found != owner:
+                continue
+
+            start = offset + self.HEADER.size
+            url = memory[start : start + length].decode(errors="replace")
+            if sequence & 1 or self.HEADER.unpack_from(memory, offset)[0] != sequence:
+                return None  # Being rewritten
+            if (remaining := deadline - time.time()) <= 0:
+                return None
+            return CacheEntry(
+                url=url,
+                expires_at=date.fromordinal(expires) if expires else None,
+                deadline=time.monotonic() + remaining,  # on the clock of `LinkCache`
+            )
+
+        return None
+
+    def acquire(self) -> bool:
+        # Becomes the writer unless another worker is; the lock is released when the process exits.
+        if not self.writer:
+            self._lock = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(self._lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self.writer = True
+            except BlockingIOError:
+                os.close(self._lock)
+        return self.writer
+
+    def write(self, offset: int, owner: int, deadline: float, expires: int, url: bytes) -> None:
+        memory = self.open()
+        sequence = self.HEADER.unpack_from(memory, offset)[0]
+
+        struct.pack_into("=I", memory, offset, (sequence + 1) & 0xFFFFFFFF | 1)  # Odd while rewritten
+        start = offset + self.HEADER.size
+        memory[start : start + len(url)] = url
+        self.HEADER.pack_into(memory, offset, (sequence + 2) & 0xFFFFFFFE, owner, deadline, expires, len(url))
+
+    def store(self, links: list[tuple[str, str, date | None]]) -> int:
+        # Replaces the contents with `links` (the hottest first) and returns how many of them fit.
+        memory, now = self.open(), time.time()
+        used: set[int] = set()
+
+        for code, url, expires_at in links:
+            encoded, owner = url.encode(), fingerprint(code)
+            if len(encoded) > self.url_bytes:
+                continue
+
+            home = owner % self.slots
+            for probe in range(PROBES):
+                if (slot := (home + probe) % self.slots) not in used:
+                    deadline = now + self.ttl
+                    if expires_at is not None:
+                        deadline = min(deadline, now + seconds_left(expires_at))
+                    with self._guard:
+                        if self._invalidated is not None and code in self._invalidated:
+                            break  # Changed since it was read
+                        self.write(
+                            slot * self.slot_size, owner, deadline, expires_at.toordinal() if expires_at else 0, encoded
+                        )
+                    used.add(slot)
+                    break
+
+        for slot in range(self.slots):
+            if slot not in used and self.HEADER.unpack_from(memory, slot * self.slot_size)[1]:
+                with self._guard:
+                    self.write(slot * self.slot_size, 0, 0, 0, b"")
+
+        return len(used)
+
+    def invalidate(self, *codes: str) -> None:
+        if not self.enabled or not self.writer:
+            return
+
+        memory = self.open()
+        with self._guard:
+            if self._invalidated is not None:
+                self._invalidated.update(codes)
+            for code in codes:
+                owner = fingerprint(code)
+                for probe in range(PROBES):
+                    offset = (owner % self.slots + probe) % self.slots * self.slot_size
+                    if self.HEADER.unpack_from(memory, offset)[1] == owner:
+                        self.write(offset, 0, 0, 0, b"")
+
+    async def refresh(self, engine: AsyncEngine) -> None:
+        if not self.enabled or not self.acquire():
+            return
+
+        # The most clicked active links of the last two days, at most half as many as slots to keep probing short
+        statement = (
+            select(Link.code, Link.url, Link.expires_at)
+            .join(Click, Click.code == Link.code)
+            .where(Click.day >= date.today() - timedelta(days=1), Link.active())
+            .group_by(Link.id)
+            .order_by(func.sum(Click.count).desc())
+            .limit(self.slots // 2)
+        )
+        self.open()  # Mapped on the event loop, the thread only writes
+        self._invalidated = set()
+        try:
+            async with engine.connect() as connection:
+                links = [(row.code, row.url, row.expires_at) for row in await connection.execute(statement)]
+
+            await asyncio.to_thread(self.store, links)  # Rewrites every slot, too long to block the event loop
+        finally:
+            self._invalidated = None
+
+    def close(self) -> None:
+        if self._memory is not None:
+            self._memory.close()
+            os.close(self._descriptor)
+            self._memory = None
+        if self.writer:
+            os.close(self._lock)  # Releases the lock
+            self.writer = False
+
+
+SHARED_LINKS = SharedLinkTable(
+    path=settings.shared_links_path,
+    slots=settings.shared_links_slots,
+    url_bytes=settings.shared_links_url_bytes,
+    ttl=3 * settings.shared_links_refresh_seconds,
+)
@@ -0,0 +1,43 @@
+import asyncio
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from source.database.models import Link
+from source.settings import settings
+from source.utils.bloom import CODE_FILTER
+from source.utils.cache import CACHE
+from source.utils.invalidation import publish
+
+
+async def sweep(
+    engine: AsyncEngine, batch_size: int = settings.sweep_batch_size, grace_days: int = settings.sweep_grace_days
+) -> int:
+    # Deletes links that expired more than `grace_days` ago (their details cascade) in small keyset-paginated
+    # batches, each in its own short transaction. Rows locked by a concurrent sweep in another worker are skipped.
+    deleted, last_id = 0, 0
+
+    while True:
+        expired = (
+            select(Link.id)
+            .where(Link.id > last_id, Link.expires_at < func.current_date() - grace_days)
+            .order_by(Link.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+
+        async with engine.begin() as connection:
+            rows = (
+                await connection.execute(delete(Link).where(Link.id.in_(expired)).returning(Link.id, Link.code))
+            ).all()
+            await publish(connection, "deleted", (code for _, code in rows))
+
+        CACHE.invalidate(*(code for _, code in rows))
+        CODE_FILTER.discard(len(rows))
+        deleted += len(rows)
+
+        if len(rows) < batch_size:
+            return deleted
+
+        last_id = max(link_id for link_id, _ in rows)
+        await asyncio.sleep(0)  # Lets requests interleave between batches
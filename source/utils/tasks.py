@@ -0,0 +1,15 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+async def repeat(interval: float, function: Callable[[], Awaitable[object]]) -> None:
+    # Runs `function` every `interval` seconds until cancelled; failures are logged and retried on the next tick.
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await function()
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.exception("Background task %s failed.", getattr(function, "__qualname__", function))
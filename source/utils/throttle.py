@@ -0,0 +1,145 @@
+import fcntl
+import math
+import mmap
+import os
+import struct
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from hashlib import blake2b
+from typing import Protocol
+
+from fastapi import HTTPException, Request, status
+
+from source.settings import settings
+from source.utils.metrics import METRICS
+
+
+@dataclass(frozen=True, slots=True)
+class Policy:
+    name: str
+    capacity: int  # burst size, i.e. requests allowed per window
+    window: float  # seconds in which a drained bucket refills completely
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.window
+
+
+class Store(Protocol):
+    # Takes a token of the bucket under `key`; returns 0 on success or the seconds until a token is available.
+    def take(self, key: str, policy: Policy, now: float) -> float: ...
+
+
+def refill(tokens: float, updated: float, policy: Policy, now: float) -> float:
+    return min(policy.capacity, tokens + max(now - updated, 0) * policy.rate)
+
+
+def consume(tokens: float, policy: Policy) -> tuple[float, float]:
+    # Returns the remaining tokens and the wait time (0 when the request is allowed).
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / policy.rate
+
+
+class MemoryStore:
+    # Per-process buckets, at most `size` of them; the least recently seen client is evicted first.
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, key: str, policy: Policy, now: float) -> float:
+        tokens, updated = self._buckets.pop(key, (policy.capacity, now))
+        tokens, wait = consume(refill(tokens, updated, policy, now), policy)
+
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.size:
+            self._buckets.popitem(last=False)
+
+        return wait
+
+
+class SharedMemoryStore:
+    # Buckets in a fixed-size memory-mapped file shared by all workers of a host (e.g. under /dev/shm). Every slot
+    # holds a key fingerprint, the tokens and the update time; a client whose slot is taken by another key simply
+    # replaces it, so memory never grows. Updates are serialized across processes with an exclusive `flock`.
+    SLOT = struct.Struct("=Qdd")
+
+    def __init__(self, path: str, size: int) -> None:
+        self.size = size
+
+        self._descriptor = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._descriptor).st_size < self.SLOT.size * size:
+            os.ftruncate(self._descriptor, self.SLOT.size * size)
+        self._memory = mmap.mmap(self._descriptor, self.SLOT.size * size)
+
+    def take(self, key: str, policy: Policy, now: float) -> float:
+        fingerprint = int.from_bytes(blake2b(key.encode(), digest_size=8).digest())
+        offset = (fingerprint % self.size) * self.SLOT.size
+
+        fcntl.flock(self._descriptor, fcntl.LOCK_EX)
+        try:
+            owner, tokens, updated = self.SLOT.unpack_from(self._memory, offset)
+            if owner != fingerprint:
+                tokens, updated = policy.capacity, now
+
+            tokens, wait = consume(refill(tokens, updated, policy, now), policy)
+            self.SLOT.pack_into(self._memory, offset, fingerprint, tokens, now)
+        finally:
+            fcntl.flock(self._descriptor, fcntl.LOCK_UN)
+
+        return wait
+
+    def close(self) -> None:
+        self._memory.close()
+        os.close(self._descriptor)
+
+
+class Throttle:
+    # Dependency enforcing a token bucket per client and policy; `/status` and other exempt paths are never limited.
+    def __init__(self, policy: Policy, store: Store) -> None:
+        self.policy = policy
+        self.store = store
+
+    async def __call__(self, request: Request) -> None:
+        if request.url.path in settings.rate_limit_exempt_paths:
+            return
+
+        client = request.client.host if request.client else "unknown"
+        wait = self.store.take(f"{self.policy.name}:{client}", self.policy, time.monotonic())
+
+        if wait > 0:
+            METRICS.inc("turl_rate_limit_rejections_total", policy=self.policy.name)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests.",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+
+def build_store() -> Store:
+    if settings.rate_limit_backend == "shared":
+        return SharedMemoryStore(path=settings.rate_limit_shared_path, size=settings.rate_limit_max_clients)
+    return MemoryStore(size=settings.rate_limit_max_clients)
+
+
+def build_throttles(store: Store) -> dict[str, Throttle]:
+    requests = {
+        "default": settings.rate_limit_requests,
+        "redirect": settings.rate_limit_redirect_requests,
+        "encode": settings.rate_limit_encode_requests,
+        "management": settings.rate_limit_management_requests,
+    }
+
+    return {
+        name: Throttle(
+            policy=Policy(
+                name=name, capacity=count or settings.rate_limit_requests, window=settings.rate_limit_window_seconds
+            ),
+            store=store,
+        )
+        for name, count in requests.items()
+    }
@@ -0,0 +1,250 @@
+import csv
+import io
+import json
+import re
+import time
+from collections.abc import AsyncIterable, AsyncIterator
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Literal
+from urllib.parse import urlsplit
+
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from source.database.models import Detail, Link
+from source.settings import settings
+from source.utils.bloom import CODE_FILTER
+from source.utils.cache import CACHE
+from source.utils.invalidation import notifications
+
+Format = Literal["ndjson", "csv"]
+Row = tuple[int, str, str, int, int | None]  # line, url, code, length, lifetime
+
+CODE_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+WHITESPACE_PATTERN = re.compile(r"\s")
+CSV_HEADER = "url,code"
+EXPORT_COLUMNS = ("url", "code", "lifetime", "length", "registered", "modified", "expires_at")
+MAX_REPORTED_ERRORS = 100
+MAX_URL_BYTES = 2048  # `uq_link_code` covers `url`, and Postgres rejects index entries above about 2700 bytes
+
+CREATE_STAGING = """
+    CREATE TEMPORARY TABLE IF NOT EXISTS link_import (
+        line bigint NOT NULL,
+        url text NOT NULL,
+        code text NOT NULL,
+        length integer NOT NULL,
+        lifetime integer
+    ) ON COMMIT DELETE ROWS
+"""
+
+# Moves a staged batch into `link` and `detail` with set-based statements and returns the lines that were skipped
+# because their code already exists (or repeats within the batch).
+MERGE_STAGING = """
+    WITH candidate AS (
+        SELECT DISTINCT ON (code) line, url, code, length, lifetime FROM link_import ORDER BY code, line
+    ), inserted AS (
+        INSERT INTO link (url, code, expires_at)
+        SELECT url, code, current_date + lifetime FROM candidate
+        ON CONFLICT (code) DO NOTHING
+        RETURNING id, code
+    ), detailed AS (
+        INSERT INTO detail (link_id, length, lifetime)
+        SELECT inserted.id, candidate.length, candidate.lifetime FROM inserted JOIN candidate USING (code)
+    )
+    SELECT link_import.line, link_import.code FROM link_import
+    WHERE NOT EXISTS (
+        SELECT 1 FROM inserted JOIN candidate USING (code) WHERE candidate.line = link_import.line
+    )
+    ORDER BY link_import.line
+"""
+
+
+@dataclass
+class ImportReport:
+    imported: int = 0
+    rejected: int = 0
+    seconds: float = 0
+    errors: list[str] = field(default_factory=list)  # only the first `MAX_REPORTED_ERRORS` rejected rows
+
+    @property
+    def rows_per_second(self) -> float:
+        return (self.imported + self.rejected) / self.seconds if self.seconds else 0
+
+    def reject(self, line: int, reason: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"Line {line}: {reason}")
+
+
+def parse_row(url: Any, code: Any, lifetime: Any = None) -> tuple[str, str, int | None]:
+    # A cheap subset of the checks `EncodeRequest` performs; pydantic models are too slow for millions of rows.
+    if not isinstance(url, str) or len(url) > 2048:
+        raise ValueError("`url` should be a string of at most 2048 characters")
+    if len(url.encode()) > MAX_URL_BYTES:
+        raise ValueError(f"`url` should take at most {MAX_URL_BYTES} bytes in UTF-8")
+
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname or WHITESPACE_PATTERN.search(url):
+        raise ValueError("`url` should be a valid http or https URL")
+
+    if not isinstance(code, str) or not CODE_PATTERN.fullmatch(code):
+        raise ValueError("`code` should consist of 1 to 64 letters, digits, dashes or underscores")
+
+    if lifetime is None or lifetime == "":
+        return url, code, None
+
+    if not isinstance(lifetime, int | str) or isinstance(lifetime, bool) or not str(lifetime).isdigit():
+        raise ValueError("`lifetime` should be a positive integer or empty")
+    if (days := int(lifetime)) <= 0:
+        raise ValueError("`lifetime` should be a positive integer or empty")
+
+    return url, code, days
+
+
+def parse_ndjson(line: str) -> tuple[str, str, int | None]:
+    try:
+        item = json.loads(line)
+    except json.JSONDecodeError as error:
+        raise ValueError("Invalid JSON") from error
+
+    if not isinstance(item, dict):
+        raise ValueError("Expected a JSON object")
+
+    return parse_row(item.get("url"), item.get("code"), item.get("lifetime"))
+
+
+def parse_csv(line: str) -> tuple[str, str, int | None]:
+    values = next(csv.reader([line]), [])
+    if len(values) < 2:
+        raise ValueError("Expected `url,code[,lifetime]` columns")
+
+    return parse_row(*values[:3])  # Further columns (e.g. from an export) are ignored
+
+
+PARSERS = {"ndjson": parse_ndjson, "csv": parse_csv}
+
+
+async def iterate_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode(errors="replace")
+
+    if buffer:
+        yield buffer.decode(errors="replace")
+
+
+async def merge_batch(driver: Any, batch: list[Row], report: ImportReport) -> None:
+    async with driver.transaction():  # Staged rows are deleted on commit
+        await driver.execute(CREATE_STAGING)
+        await driver.copy_records_to_table(
+            "link_import", records=batch, columns=["line", "url", "code", "length", "lifetime"]
+        )
+        skipped = await driver.fetch(MERGE_STAGING)
+        skipped_lines = {line for line, _ in skipped}
+        for payload in notifications("created", (row[2] for row in batch if row[0] not in skipped_lines)):
+            await driver.execute("SELECT pg_notify($1, $2)", settings.invalidation_channel, payload)
+
+    for line, code in skipped:
+        report.reject(line, f"Code `{code}` is already taken")
+
+    report.imported += len(batch) - len(skipped)
+    CACHE.invalidate(*(row[2] for row in batch))
+    CODE_FILTER.add(*(row[2] for row in batch))  # Skipped codes exist as well
+
+
+async def import_links(
+    engine: AsyncEngine, lines: AsyncIterable[str], file_format: Format, batch_size: int = settings.import_batch_size
+) -> ImportReport:
+    # Streams rows into a temporary staging table with the COPY protocol, one bounded batch per transaction.
+    report = ImportReport()
+    started = time.perf_counter()
+
+    async with engine.connect() as connection:
+        driver = (await connection.get_raw_connection()).driver_connection
+        batch: list[Row] = []
+
+        number = 0
+        async for line in lines:
+            number += 1
+            if not line.strip() or (number == 1 and file_format == "csv" and line.startswith(CSV_HEADER)):
+                continue  # Skips blank lines and the optional CSV header
+
+            try:
+                url, code, lifetime = PARSERS[file_format](line)
+                batch.append((number, url, code, len(code), lifetime))
+            except ValueError as error:
+                report.reject(number, str(error))
+                continue
+
+            if len(batch) >= batch_size:
+                await merge_batch(driver=driver, batch=batch, report=report)
+                batch = []
+
+        if batch:
+            await merge_batch(driver=driver, batch=batch, report=report)
+
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def export_statement(
+    expired: bool | None = None, registered_from: date | None = None, registered_to: date | None = None
+) -> Select:
+    statement = select(
+        Link.id,
+        Link.url,
+        Link.code,
+        Detail.lifetime,
+        Detail.length,
+        Detail.registered,
+        Detail.modified,
+        Link.expires_at,
+    ).join(Detail)
+
+    if expired is not None:
+        statement = statement.where(~Link.active() if expired else Link.active())
+    if registered_from is not None:
+        statement = statement.where(Detail.registered >= registered_from)
+    if registered_to is not None:
+        statement = statement.where(Detail.registered <= registered_to)
+
+    return statement.order_by(Link.id)
+
+
+def serialize(rows: list[tuple], file_format: Format, header: bool = False) -> bytes:
+    if file_format == "ndjson":
+        return "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row, strict=True)), default=str) + "\n" for row in rows
+        ).encode()
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+async def export_links(
+    engine: AsyncEngine, statement: Select, file_format: Format, chunk_size: int = settings.export_chunk_size
+) -> AsyncIterator[bytes]:
+    # Walks the table in keyset-paginated chunks. Every chunk is read through a server-side cursor on a connection
+    # that goes back to the pool before the next chunk, so slow consumers never pin a connection for the whole dump.
+    last_id, header = 0, file_format == "csv"
+
+    while True:
+        async with engine.connect() as connection:
+            result = await connection.stream(statement.where(Link.id > last_id).limit(chunk_size))
+            rows = [tuple(row) async for row in result]
+
+        if header or rows:
+            yield serialize([row[1:] for row in rows], file_format=file_format, header=header)
+            header = False
+
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1][0]
@@ -3,15 +3,24 @@ from typing import Any
 
 import faker
 import pytest
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from httpx import ASGITransport, AsyncClient
 from sqlalchemy import NullPool, delete
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
 from source.app import create_app
+from source.database.connection import get_engine as get_engine_dependency
 from source.database.connection import get_session as get_session_dependency
-from source.database.models import Base, Detail, Link
+from source.database.lookup import Lookup, OrmLookup, RawLookup
+from source.database.lookup import get_lookup as get_lookup_dependency
+from source.database.models import Base, Detail, Link, expiration
 from source.settings import settings
+from source.utils.admission import ADMISSION
+from source.utils.allocator import ALLOCATOR, RESERVOIR
+from source.utils.analytics import CLICKS
+from source.utils.bloom import CODE_FILTER
+from source.utils.cache import CACHE
+from source.utils.metrics import METRICS
 
 fake = faker.Faker()
 
@@ -38,6 +47,27 @@ def fixture_app(engine: AsyncEngine) -> FastAPI:
             yield session
 
     application.dependency_overrides[get_session_dependency] = override_get_session
+
+    # pylint: disable=unused-argument
+    async def override_get_lookup(request: Request) -> AsyncGenerator[Lookup, None]:
+        if settings.lookup_backend == "raw":
+            yield RawLookup(engine=engine)
+            return
+
+        async with session_maker() as session:
+            yield OrmLookup(session)
+
+    application.dependency_overrides[get_lookup_dependency] = override_get_lookup
+    application.dependency_overrides[get_engine_dependency] = lambda: engine
+
+    # Cached codes and reserved counter blocks must not leak between tests as the tables are wiped after each of them
+    CACHE.clear()
+    ALLOCATOR.reset()
+    RESERVOIR.reset()
+    CLICKS.clear()
+    CODE_FILTER.reset()
+    ADMISSION.reset()
+    METRICS.clear()
     return application
 
 
@@ -107,7 +137,9 @@ def link_factory(db_session: AsyncSession) -> Callable[..., Awaitable[Link]]:
         length: int = fake.pyint(min_value=2, max_value=8),
         lifetime: int = fake.pyint(min_value=2, max_value=10),
     ) -> Link:
-        link = Link(url=url, code=code, detail=Detail(length=length, lifetime=lifetime))
+        link = Link(
+            url=url, code=code, expires_at=expiration(lifetime), detail=Detail(length=length, lifetime=lifetime)
+        )
         db_session.add(link)
         await db_session.commit()
         return link
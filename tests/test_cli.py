@@ -0,0 +1,43 @@
+import json
+from collections.abc import AsyncIterator
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from source.cli import main
+from source.utils.transfer import ImportReport
+
+
+@pytest.mark.parametrize("name, file_format", [("links.csv", "csv"), ("links.ndjson", "ndjson")])
+def test_import(tmp_path: Path, capsys: pytest.CaptureFixture[str], name: str, file_format: str) -> None:
+    path = tmp_path / name
+    path.write_text("")
+
+    with patch("source.cli.import_links", new_callable=AsyncMock) as mock_import:
+        mock_import.return_value = ImportReport(imported=3, rejected=1, seconds=2, errors=["Line 1: error"])
+        main(["import", str(path)])
+
+    assert mock_import.call_args.kwargs["file_format"] == file_format
+    assert json.loads(capsys.readouterr().out) == {
+        "imported": 3,
+        "rejected": 1,
+        "seconds": 2,
+        "rows_per_second": 2.0,
+        "errors": ["Line 1: error"],
+    }
+
+
+@pytest.mark.parametrize("name, file_format", [("links.csv", "csv"), ("links.ndjson", "ndjson")])
+def test_export(tmp_path: Path, name: str, file_format: str) -> None:
+    async def chunks(**kwargs: object) -> AsyncIterator[bytes]:  # pylint: disable=unused-argument
+        yield b"first\n"
+        yield b"second\n"
+
+    path = tmp_path / name
+
+    with patch("source.cli.export_links", side_effect=chunks) as mock_export:
+        main(["export", "--output", str(path), "--expired", "--registered-from", "2025-01-01"])
+
+    assert mock_export.call_args.kwargs["file_format"] == file_format
+    assert path.read_text() == "first\nsecond\n"
@@ -1,9 +1,23 @@
-from collections.abc import Awaitable, Callable
+import asyncio
+import time
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from datetime import date
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
 
-from fastapi import status
-from httpx import AsyncClient
+from fastapi import FastAPI, Request, status
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 
-from source.database.models import Link
+from source.app import create_app
+from source.database.lookup import Lookup, OrmLookup, get_lookup
+from source.database.models import Detail, Link
+from source.settings import settings
+from source.utils.analytics import CLICKS
+from source.utils.bloom import CODE_FILTER
+from source.utils.cache import CACHE
+from source.utils.metrics import METRICS
+from source.utils.shared import SharedLinkTable
 
 
 async def test_decode__success(
@@ -15,6 +29,8 @@ async def test_decode__success(
 
     assert response.status_code == status.HTTP_308_PERMANENT_REDIRECT
     assert response.headers["location"] == random_url
+    assert response.headers["cache-control"] == "public, max-age=3600"
+    assert len(CLICKS) == 1  # Recorded in memory only
 
 
 async def test_decode__failure(client: AsyncClient, random_code: str) -> None:
@@ -25,3 +41,181 @@ async def test_decode__failure(client: AsyncClient, random_code: str) -> None:
     response_data = response.json()
     assert "detail" in response_data
     assert "There's no `link` assigned to this code" in response_data["detail"]
+
+
+async def test_decode__cached(
+    client: AsyncClient, random_url: str, random_code: str, link_factory: Callable[..., Awaitable[Link]]
+) -> None:
+    await link_factory(url=random_url, code=random_code)
+
+    await client.get(f"/d/{random_code}")
+    with patch.object(OrmLookup, "redirect", new_callable=AsyncMock) as mock_redirect:
+        response = await client.get(f"/d/{random_code}")
+
+        assert mock_redirect.call_count == 0
+
+    assert response.status_code == status.HTTP_308_PERMANENT_REDIRECT
+    assert response.headers["location"] == random_url
+
+
+async def test_decode__negative_cached(client: AsyncClient, random_code: str) -> None:
+    await client.get(f"/d/{random_code}")
+    with patch.object(OrmLookup, "redirect", new_callable=AsyncMock) as mock_redirect:
+        response = await client.get(f"/d/{random_code}")
+
+        assert mock_redirect.call_count == 0
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+async def test_decode__expired(
+    client: AsyncClient, random_url: str, random_code: str, db_session: AsyncSession
+) -> None:
+    db_session.add(
+        Link(
+            url=random_url,
+            code=random_code,
+            expires_at=date(2020, 1, 2),
+            detail=Detail(length=len(random_code), lifetime=1, registered=date(2020, 1, 1)),
+        )
+    )
+    await db_session.commit()
+
+    response = await client.get(f"/d/{random_code}")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+async def test_decode__throttled(client: AsyncClient, random_code: str) -> None:
+    for _ in range(2):
+        await client.get(f"/d/{random_code}")
+
+    response = await client.get(f"/d/{random_code}")
+
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert response.json() == {"detail": "Too many requests."}
+    assert int(response.headers["retry-after"]) > 0
+    assert 'turl_requests_total{route="/d/{code}",method="GET",status="429"} 1' in METRICS.render()
+
+
+async def test_decode__fast_path_matches_route(
+    app: FastAPI, client: AsyncClient, random_code: str, link_factory: Callable[..., Awaitable[Link]]
+) -> None:
+    await link_factory(url="https://example.com/a b?q=ü", code=random_code)
+
+    with patch.object(settings, "redirect_fast_path", False):
+        routed = create_app()
+    routed.dependency_overrides = app.dependency_overrides
+
+    async with AsyncClient(transport=ASGITransport(app=routed), base_url="http://test") as routed_client:
+        for path in (f"/d/{random_code}", "/d/missing"):
+            fast, slow = await client.get(path), await routed_client.get(path)
+
+            assert fast.status_code == slow.status_code
+            assert fast.headers == slow.headers
+            assert fast.content == slow.content
+
+
+async def test_decode__fast_path_closes_lookup(app: FastAPI, client: AsyncClient, random_code: str) -> None:
+    events = []
+
+    async def override_get_lookup(request: Request) -> AsyncGenerator[Lookup]:
+        events.append(request.path_params["code"])
+        try:
+            yield AsyncMock(redirect=AsyncMock(return_value=None))
+        finally:
+            events.append("closed")
+
+    app.dependency_overrides[get_lookup] = override_get_lookup
+    response = await client.get(f"/d/{random_code}")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert events == [random_code, "closed"]
+
+
+async def test_decode__code_filter(client: AsyncClient, engine: AsyncEngine, random_code: str) -> None:
+    CODE_FILTER.listening_since = time.monotonic()
+    await CODE_FILTER.build(engine)
+
+    with patch.object(OrmLookup, "redirect", new_callable=AsyncMock) as mock_redirect:
+        response = await client.get(f"/d/{random_code}")
+
+        assert mock_redirect.call_count == 0
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert "turl_code_filter_rejections_total 1" in METRICS.render()
+
+
+async def test_decode__code_filter_miss(
+    client: AsyncClient,
+    engine: AsyncEngine,
+    random_url: str,
+    random_code: str,
+    link_factory: Callable[..., Awaitable[Link]],
+) -> None:
+    await CODE_FILTER.build(engine)  # Not trusted, no listener hears of other workers' codes
+    await link_factory(url=random_url, code=random_code)  # Created by another worker, not synced yet
+
+    response = await client.get(f"/d/{random_code}")
+
+    assert response.status_code == settings.redirect_status
+    assert response.headers["location"] == random_url
+    assert CODE_FILTER.may_exist(random_code)
+    assert "turl_code_filter_misses_total 1" in METRICS.render()
+
+
+async def test_decode__cache_control_capped_by_expiry(
+    client: AsyncClient, random_url: str, random_code: str, db_session: AsyncSession
+) -> None:
+    db_session.add(Link(url=random_url, code=random_code, expires_at=date.today(), detail=Detail(length=5, lifetime=1)))
+    await db_session.commit()
+
+    with patch.object(settings, "redirect_max_age_seconds", 10**6):
+        response = await client.get(f"/d/{random_code}")
+
+    max_age = int(response.headers["cache-control"].removeprefix("public, max-age="))
+    assert 0 <= max_age <= 86400  # Until the end of the day
+
+
+async def test_decode__redirect_status(
+    client: AsyncClient, random_url: str, random_code: str, link_factory: Callable[..., Awaitable[Link]]
+) -> None:
+    await link_factory(url=random_url, code=random_code)
+
+    with patch.object(settings, "redirect_status", status.HTTP_302_FOUND):
+        response = await client.get(f"/d/{random_code}")
+
+    assert response.status_code == status.HTTP_302_FOUND
+    assert response.headers["location"] == random_url
+
+
+async def test_decode__shared_table(client: AsyncClient, random_url: str, random_code: str, tmp_path: Path) -> None:
+    shared = SharedLinkTable(path=str(tmp_path / "links"), slots=16, url_bytes=256, ttl=60)
+    shared.acquire()
+    shared.store([(random_code, random_url, None)])  # Written by another worker, not in the database
+
+    with patch("source.endpoints.decode.SHARED_LINKS", shared):
+        response = await client.get(f"/d/{random_code}")
+    shared.close()
+
+    assert response.status_code == settings.redirect_status
+    assert response.headers["location"] == random_url
+    assert CACHE.get(random_code) is None  # Not copied into the worker's cache
+
+
+async def test_decode__coalesced(
+    client: AsyncClient, random_url: str, random_code: str, link_factory: Callable[..., Awaitable[Link]]
+) -> None:
+    await link_factory(url=random_url, code=random_code)
+
+    async def slow_redirect(code: str) -> tuple[str, date | None]:  # pylint: disable=unused-argument
+        await asyncio.sleep(0.05)
+        return random_url, None
+
+    with patch.object(OrmLookup, "redirect", new_callable=AsyncMock, side_effect=slow_redirect) as mock_redirect:
+        responses = await asyncio.gather(*(client.get(f"/d/{random_code}") for _ in range(2)))
+
+        assert mock_redirect.call_count == 1
+
+    assert [response.headers["location"] for response in responses] == [random_url] * 2
+    assert "turl_coalesced_requests_total 1" in METRICS.render()
@@ -1,18 +1,26 @@
+import asyncio
 from collections.abc import Awaitable, Callable
-from unittest.mock import patch
+from datetime import timedelta
+from typing import Any
+from unittest.mock import AsyncMock, patch
 
 import faker
 import pytest
-from fastapi import status
-from httpx import AsyncClient
+from fastapi import FastAPI, status
+from httpx import ASGITransport, AsyncClient
 from pydantic import ValidationError
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 from sqlalchemy.orm import joinedload
 
+from source.app import create_app
 from source.database.models import Link
-from source.endpoints.encode import EncodeRequest
+from source.endpoints.encode import GROUP_COMMIT, EncodeRequest, create_links
 from source.settings import settings
+from source.utils.admission import ADMISSION
+from source.utils.allocator import ALLOCATOR, RESERVOIR, CodeSpaceExhaustedError
+from source.utils.bloom import CODE_FILTER
+from source.utils.metrics import METRICS
 
 fake = faker.Faker()
 
@@ -81,6 +89,7 @@ async def test_encode__success(
     assert link.url == random_url
     assert link.detail.length == random_length
     assert link.detail.lifetime == random_lifetime
+    assert link.expires_at == link.detail.registered + timedelta(days=random_lifetime)
 
 
 async def test_encode__failure_max_attempts_exceeded(
@@ -92,7 +101,7 @@ async def test_encode__failure_max_attempts_exceeded(
 ) -> None:
     await link_factory(url=random_url, code=random_code)
 
-    with patch("source.endpoints.encode.code") as mock_code:
+    with patch("source.endpoints.encode.ALLOCATOR.allocate", new_callable=AsyncMock) as mock_code:
         mock_code.return_value = random_code
 
         response = await client.post("/encode", json={"url": random_url, "lifetime": None, "length": random_length})
@@ -103,3 +112,241 @@ async def test_encode__failure_max_attempts_exceeded(
         response_data = response.json()
         assert "detail" in response_data
         assert "Could not generate a unique code" in response_data["detail"]
+
+
+async def test_encode__failure_code_space_exhausted(client: AsyncClient, random_url: str) -> None:
+    with patch("source.endpoints.encode.ALLOCATOR.allocate", side_effect=CodeSpaceExhaustedError) as mock_code:
+        response = await client.post("/encode", json={"url": random_url, "lifetime": None, "length": 1})
+
+        assert response.status_code == status.HTTP_406_NOT_ACCEPTABLE
+        assert mock_code.call_count == 1
+
+
+async def test_encode__reservoir(client: AsyncClient, engine: AsyncEngine, random_url: str) -> None:
+    await RESERVOIR.refill(engine)
+    depth = RESERVOIR.depths()[5]
+
+    with patch("source.endpoints.encode.ALLOCATOR.allocate", new_callable=AsyncMock) as mock_code:
+        response = await client.post("/encode", json={"url": random_url, "lifetime": None, "length": 5})
+
+        assert mock_code.call_count == 0
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert RESERVOIR.depths()[5] == depth - 1
+
+
+async def test_encode__group_commit(client: AsyncClient, db_session: AsyncSession) -> None:
+    urls = [fake.url() for _ in range(2)]
+
+    with (
+        patch.object(settings, "encode_group_commit", True),
+        patch("source.endpoints.encode.create_links", new_callable=AsyncMock, side_effect=create_links) as mock_create,
+    ):
+        responses = await asyncio.gather(
+            *(client.post("/encode", json={"url": url, "lifetime": None, "length": 6}) for url in urls)
+        )
+
+        assert mock_create.call_count == 1  # Both in one transaction
+
+    assert [response.status_code for response in responses] == [status.HTTP_201_CREATED] * 2
+    for url, response in zip(urls, responses, strict=True):
+        link = await db_session.scalar(select(Link).where(Link.code == response.json()["url"].split("/")[-1]))
+        assert link is not None and link.url == url
+
+
+async def test_encode__group_commit_beyond_admission_limit(app: FastAPI, db_session: AsyncSession) -> None:
+    urls = [fake.url() for _ in range(ADMISSION.limit + 5)]
+
+    with patch.object(settings, "rate_limit_encode_requests", len(urls)):
+        unthrottled = create_app()
+    unthrottled.dependency_overrides = app.dependency_overrides
+
+    with (
+        patch.object(settings, "encode_group_commit", True),
+        patch.object(GROUP_COMMIT, "delay", 0.2),
+        patch("source.endpoints.encode.create_links", new_callable=AsyncMock, side_effect=create_links) as mock_create,
+    ):
+        async with AsyncClient(transport=ASGITransport(app=unthrottled), base_url="http://test") as client:
+            responses = await asyncio.gather(
+                *(client.post("/encode", json={"url": url, "lifetime": None, "length": 6}) for url in urls)
+            )
+
+        assert mock_create.call_count == 1  # Waiting for the group takes no admission slot
+
+    assert [response.status_code for response in responses] == [status.HTTP_201_CREATED] * len(urls)
+    assert len((await db_session.scalars(select(Link))).all()) == len(urls)
+
+
+async def test_encode_batch__success(client: AsyncClient, db_session: AsyncSession) -> None:
+    items: list[dict[str, Any]] = [
+        {"url": fake.url(), "lifetime": None, "length": 4},
+        {"url": "not-a-url", "lifetime": None, "length": 4},
+        {"url": fake.url(), "lifetime": 5, "length": 6},
+    ]
+
+    response = await client.post("/encode/batch", json={"items": items})
+
+    assert response.status_code == status.HTTP_200_OK
+
+    results = response.json()["results"]
+    assert len(results) == len(items)
+    assert results[1]["url"] is None
+    assert "Input should be a valid URL" in results[1]["error"]
+
+    for item, result in zip(items[::2], results[::2], strict=True):
+        assert result["error"] is None
+
+        code = result["url"].split("/")[-1]
+        assert len(code) == item["length"]
+
+        link = await db_session.scalar(select(Link).options(joinedload(Link.detail)).where(Link.code == code))
+        assert link is not None
+        assert link.url == item["url"]
+        assert link.detail.length == item["length"]
+        assert link.detail.lifetime == item["lifetime"]
+
+
+async def test_encode_batch__allocates_without_a_connection(
+    client: AsyncClient,
+    engine: AsyncEngine,
+    random_url: str,
+    random_code: str,
+    link_factory: Callable[..., Awaitable[Link]],
+) -> None:
+    await link_factory(url=random_url, code=random_code)
+    held: list[int] = [0]
+    event.listen(engine.sync_engine, "checkout", lambda *_: held.append(held[-1] + 1))
+    event.listen(engine.sync_engine, "checkin", lambda *_: held.append(held[-1] - 1))
+    allocate_many, codes = ALLOCATOR.allocate_many, iter([[random_code], ["fresh"]])
+
+    async def allocate(**kwargs: Any) -> list[str]:
+        assert held[-1] == 0  # The allocator takes a connection of its own, none may be held meanwhile
+        await allocate_many(**kwargs)
+        return next(codes)
+
+    with patch("source.endpoints.encode.ALLOCATOR.allocate_many", side_effect=allocate):
+        response = await client.post(
+            "/encode/batch", json={"items": [{"url": fake.url(), "lifetime": None, "length": 5, "dedupe": True}]}
+        )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["results"][0]["url"].endswith("/d/fresh")
+
+
+async def test_encode_batch__regenerates_conflicting_codes(
+    client: AsyncClient, random_url: str, random_code: str, link_factory: Callable[..., Awaitable[Link]]
+) -> None:
+    await link_factory(url=random_url, code=random_code)
+
+    with patch("source.endpoints.encode.ALLOCATOR.allocate_many", new_callable=AsyncMock) as mock_allocate:
+        mock_allocate.side_effect = [[random_code, "first"], ["second"]]
+
+        response = await client.post(
+            "/encode/batch",
+            json={"items": [{"url": fake.url(), "lifetime": None, "length": 5} for _ in range(2)]},
+        )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [result["url"].split("/")[-1] for result in response.json()["results"]] == ["second", "first"]
+    assert mock_allocate.call_count == 2
+
+
+async def test_encode_batch__failure_max_attempts_exceeded(
+    client: AsyncClient, random_url: str, random_code: str, link_factory: Callable[..., Awaitable[Link]]
+) -> None:
+    await link_factory(url=random_url, code=random_code)
+
+    with patch("source.endpoints.encode.ALLOCATOR.allocate_many", new_callable=AsyncMock) as mock_allocate:
+        mock_allocate.return_value = [random_code]
+
+        response = await client.post(
+            "/encode/batch", json={"items": [{"url": fake.url(), "lifetime": None, "length": 5}]}
+        )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["results"] == [
+        {"url": None, "error": "Could not generate a unique code. Try again or increase `length`."}
+    ]
+    assert mock_allocate.call_count == settings.max_code_generation_attempts
+
+
+@pytest.mark.parametrize("count", [0, settings.max_batch_size + 1])
+async def test_encode_batch__failure_size(client: AsyncClient, count: int) -> None:
+    response = await client.post(
+        "/encode/batch", json={"items": [{"url": fake.url(), "lifetime": None, "length": 5}] * count}
+    )
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+async def test_encode__dedupe_reuses_code(client: AsyncClient, random_url: str, db_session: AsyncSession) -> None:
+    payload = {"url": random_url, "lifetime": 7, "length": 6, "dedupe": True}
+
+    created = await client.post("/encode", json=payload)
+    reused = await client.post("/encode", json=payload)
+
+    assert created.status_code == status.HTTP_201_CREATED
+    assert reused.status_code == status.HTTP_200_OK
+    assert reused.json()["url"] == created.json()["url"]
+    assert len((await db_session.scalars(select(Link))).all()) == 1
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [{"dedupe": False}, {"lifetime": 8}, {"lifetime": None}, {"length": 7}, {"url": "https://example.com/other"}],
+)
+async def test_encode__dedupe_creates_distinct_link(client: AsyncClient, changes: dict[str, Any]) -> None:
+    payload = {"url": "https://example.com/", "lifetime": 7, "length": 6, "dedupe": True}
+
+    created = await client.post("/encode", json=payload)
+    other = await client.post("/encode", json=payload | changes)
+
+    assert other.status_code == status.HTTP_201_CREATED
+    assert other.json()["url"] != created.json()["url"]
+
+
+async def test_encode__fingerprints_dedupe_links_only(client: AsyncClient, db_session: AsyncSession) -> None:
+    payload = {"url": "https://example.com/", "lifetime": 7, "length": 6}
+
+    plain = await client.post("/encode", json=payload)
+    deduplicating = await client.post("/encode", json={**payload, "dedupe": True})
+
+    assert deduplicating.status_code == status.HTTP_201_CREATED  # The plain link is not a candidate
+    hashes = {row.code: row.url_hash for row in await db_session.execute(select(Link.code, Link.url_hash))}
+    assert hashes[plain.json()["url"].split("/")[-1]] is None
+    assert hashes[deduplicating.json()["url"].split("/")[-1]] is not None
+
+
+async def test_encode_batch__dedupe(client: AsyncClient, db_session: AsyncSession) -> None:
+    existing = await client.post(
+        "/encode", json={"url": "https://example.com/a", "lifetime": None, "length": 5, "dedupe": True}
+    )
+    items: list[dict[str, Any]] = [
+        {"url": "https://EXAMPLE.com:443/a", "lifetime": None, "length": 5, "dedupe": True},
+        {"url": "https://example.com/b", "lifetime": None, "length": 5, "dedupe": True},
+        {"url": "https://example.com/b", "lifetime": None, "length": 5, "dedupe": True},
+        {"url": "https://example.com/b", "lifetime": None, "length": 5},
+    ]
+
+    response = await client.post("/encode/batch", json={"items": items})
+
+    urls = [result["url"] for result in response.json()["results"]]
+    assert urls[0] == existing.json()["url"]
+    assert urls[1] == urls[2]
+    assert len(set(urls)) == 3
+    assert len((await db_session.scalars(select(Link))).all()) == 3
+
+
+async def test_encode__uses_codes_in_filter(client: AsyncClient, engine: AsyncEngine, random_url: str) -> None:
+    await CODE_FILTER.build(engine)
+    CODE_FILTER.add("fresh")  # A false positive, the insert decides
+
+    with patch("source.endpoints.encode.ALLOCATOR.allocate", new_callable=AsyncMock) as mock_code:
+        mock_code.return_value = "fresh"
+
+        response = await client.post("/encode", json={"url": random_url, "lifetime": None, "length": 5})
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["url"].endswith("/d/fresh")
+    assert mock_code.call_count == 1
+    assert "turl_encode_retries_total{" not in METRICS.render()
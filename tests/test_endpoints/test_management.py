@@ -1,10 +1,17 @@
 from collections.abc import Awaitable, Callable
+from datetime import date, timedelta
+from unittest.mock import patch
 
 import pytest
 from fastapi import status
 from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import joinedload
 
-from source.database.models import Link
+from source.database.connection import PRIMARY_COOKIE, ReadRouter
+from source.database.models import Click, Link
+from source.utils.cache import CACHE
 
 
 async def test_info__success(
@@ -26,6 +33,24 @@ async def test_info__success(
     assert "expired" in response_data
 
 
+async def test_info__conditional(
+    client: AsyncClient, random_url: str, random_code: str, link_factory: Callable[..., Awaitable[Link]]
+) -> None:
+    await link_factory(url=random_url, code=random_code)
+
+    response = await client.get(f"/info/{random_code}")
+    etag = response.headers["etag"]
+
+    assert response.headers["cache-control"] == "private, no-cache"
+    assert response.headers["last-modified"].endswith(" GMT")
+
+    response = await client.get(f"/info/{random_code}", headers={"If-None-Match": etag})
+
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["etag"] == etag
+    assert not response.content
+
+
 async def test_info__failure(client: AsyncClient, random_code: str) -> None:
     response = await client.get(f"/info/{random_code}")
 
@@ -36,6 +61,28 @@ async def test_info__failure(client: AsyncClient, random_code: str) -> None:
     assert "There's no `link` assigned to this code or the link has been already revoked" in response_data["detail"]
 
 
+async def test_info_batch__success(client: AsyncClient, link_factory: Callable[..., Awaitable[Link]]) -> None:
+    await link_factory(url="https://example.com/a", code="first")
+    await link_factory(url="https://example.com/b", code="second")
+
+    response = await client.post("/info/batch", json={"codes": ["second", "missing", "first", "missing"]})
+
+    assert response.status_code == status.HTTP_200_OK
+
+    response_data = response.json()
+    assert response_data["missing"] == ["missing"]
+    assert response_data["found"].keys() == {"first", "second"}
+    assert response_data["found"]["first"]["url"] == "https://example.com/a"
+    assert response_data["found"]["second"]["url"] == "https://example.com/b"
+
+
+@pytest.mark.parametrize("count", [0, 1001])
+async def test_info_batch__failure_size(client: AsyncClient, count: int) -> None:
+    response = await client.post("/info/batch", json={"codes": [f"code{index}" for index in range(count)]})
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
 @pytest.mark.parametrize("lifetime", [None, 30])
 async def test_extend__success(  # pylint: disable=too-many-arguments, too-many-positional-arguments
     client: AsyncClient,
@@ -63,8 +110,12 @@ async def test_extend__success(  # pylint: disable=too-many-arguments, too-many-
     # Verify lifetime was updated correctly
     if lifetime is None:
         assert response_data["lifetime"] is None  # Should be set to infinite lifetime
+        assert response_data["expires_at"] is None
     else:
         assert response_data["lifetime"] == random_lifetime + lifetime  # Should be original + extended
+        assert date.fromisoformat(response_data["expires_at"]) == date.fromisoformat(
+            response_data["registered"]
+        ) + timedelta(days=random_lifetime + lifetime)
 
 
 async def test_extend__failure(client: AsyncClient, random_lifetime: int, random_code: str) -> None:
@@ -75,3 +126,96 @@ async def test_extend__failure(client: AsyncClient, random_lifetime: int, random
     response_data = response.json()
     assert "detail" in response_data
     assert "There's no `link` assigned to this code" in response_data["detail"]
+
+
+async def test_extend__invalidates_cache(client: AsyncClient, link_factory: Callable[..., Awaitable[Link]]) -> None:
+    link = await link_factory()
+    CACHE.set(link.code, link.url)
+
+    response = await client.patch(f"/extend/{link.code}", json={"lifetime": None})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert CACHE.get(link.code) is None
+
+
+async def test_extend__read_your_writes(
+    client: AsyncClient, engine: AsyncEngine, random_code: str, link_factory: Callable[..., Awaitable[Link]]
+) -> None:
+    await link_factory(code=random_code)
+    replica = create_async_engine("postgresql+asyncpg://127.0.0.1:1/turl")  # never connected to
+    router = ReadRouter(primary=engine, replica=replica, retry=30, sticky=10)
+
+    with patch("source.endpoints.management.READS", router):
+        response = await client.patch(f"/extend/{random_code}", json={"lifetime": None})
+
+    assert response.cookies[PRIMARY_COOKIE] == "1"
+    assert router.engine(random_code) is engine
+    await replica.dispose()
+
+
+async def test_extend_batch__success(
+    client: AsyncClient, db_session: AsyncSession, link_factory: Callable[..., Awaitable[Link]]
+) -> None:
+    await link_factory(url="https://example.com/a", code="first", lifetime=5)
+    await link_factory(url="https://example.com/b", code="second", lifetime=10)
+    CACHE.set("first", "https://example.com/a")
+
+    response = await client.post("/extend/batch", json={"codes": ["first", "second", "missing"], "lifetime": 3})
+
+    assert response.status_code == status.HTTP_200_OK
+
+    response_data = response.json()
+    assert response_data["missing"] == ["missing"]
+    assert response_data["found"]["first"]["lifetime"] == 8
+    assert response_data["found"]["second"]["lifetime"] == 13
+    assert CACHE.get("first") is None
+
+    statement = select(Link).options(joinedload(Link.detail)).execution_options(populate_existing=True)
+    links = {link.code: link for link in await db_session.scalars(statement)}  # Not the factory's stale objects
+    assert links["first"].expires_at == links["first"].detail.registered + timedelta(days=8)
+    assert links["second"].detail.lifetime == 13
+
+
+async def test_extend_batch__infinite(client: AsyncClient, link_factory: Callable[..., Awaitable[Link]]) -> None:
+    await link_factory(code="first", lifetime=5)
+
+    response = await client.post("/extend/batch", json={"codes": ["first"], "lifetime": None})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["found"]["first"]["expires_at"] is None
+
+
+async def test_clicks__failure(client: AsyncClient, random_code: str) -> None:
+    response = await client.get(f"/clicks/{random_code}")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+async def test_clicks__success(
+    client: AsyncClient,
+    random_url: str,
+    random_code: str,
+    link_factory: Callable[..., Awaitable[Link]],
+    db_session: AsyncSession,
+) -> None:
+    await link_factory(url=random_url, code=random_code)
+    db_session.add_all(
+        [
+            Click(code=random_code, day=date(2025, 1, 2), count=5),
+            Click(code=random_code, day=date(2025, 1, 1), count=2),
+            Click(code="other", day=date(2025, 1, 1), count=7),
+        ]
+    )
+    await db_session.commit()
+
+    response = await client.get(f"/clicks/{random_code}")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "total": 7,
+        "days": [{"day": "2025-01-01", "count": 2}, {"day": "2025-01-02", "count": 5}],
+    }
+
+    response = await client.get(f"/clicks/{random_code}", params={"since": "2025-01-02"})
+
+    assert response.json() == {"total": 5, "days": [{"day": "2025-01-02", "count": 5}]}
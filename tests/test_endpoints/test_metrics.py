@@ -0,0 +1,25 @@
+from fastapi import status
+from httpx import AsyncClient
+
+
+async def test_metrics(client: AsyncClient) -> None:
+    await client.get("/status")
+    await client.get("/d/unknown")
+
+    response = await client.get("/metrics")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'turl_requests_total{route="/status",method="GET",status="200"} 1' in response.text
+    assert 'turl_requests_total{route="/d/{code}",method="GET",status="404"} 1' in response.text
+    assert 'turl_request_duration_seconds_count{route="/status",method="GET"} 1' in response.text
+
+
+async def test_metrics__rate_limit_rejections(client: AsyncClient) -> None:
+    for _ in range(3):
+        await client.get("/")
+
+    response = await client.get("/metrics")
+
+    assert 'turl_rate_limit_rejections_total{policy="default"} 1' in response.text
+    assert 'turl_requests_total{route="/",method="GET",status="429"} 1' in response.text
@@ -1,18 +1,62 @@
+from unittest.mock import patch
+
 from fastapi import status
 from httpx import AsyncClient
 
+from source.settings import settings
+from source.utils.admission import ADMISSION
+
 
 async def test_status(client: AsyncClient) -> None:
     response = await client.get("/status")
     assert response.status_code == status.HTTP_200_OK
 
 
+async def test_status_not_throttled(client: AsyncClient) -> None:
+    for _ in range(5):
+        response = await client.get("/status")
+        assert response.status_code == status.HTTP_200_OK
+
+
 async def test_throttle(client: AsyncClient) -> None:
-    r1 = await client.get("/status")
-    assert r1.status_code == status.HTTP_200_OK
+    r1 = await client.get("/")
+    assert r1.status_code == status.HTTP_308_PERMANENT_REDIRECT
 
-    r2 = await client.get("/status")
-    assert r2.status_code == status.HTTP_200_OK
+    r2 = await client.get("/")
+    assert r2.status_code == status.HTTP_308_PERMANENT_REDIRECT
 
-    r3 = await client.get("/status")
+    r3 = await client.get("/")
     assert r3.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert int(r3.headers["Retry-After"]) > 0
+
+
+async def test_throttle_per_endpoint_group(client: AsyncClient) -> None:
+    for _ in range(2):
+        await client.get("/")
+
+    assert (await client.get("/")).status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert (await client.get("/d/unknown")).status_code == status.HTTP_404_NOT_FOUND
+
+
+async def test_pool_status(client: AsyncClient) -> None:
+    response = await client.get("/status/pool")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert set(response.json()["primary"]) == {"size", "checked_in", "checked_out", "overflow"}
+    assert response.json()["admission"]["limit"] == settings.pool_size + settings.pool_max_overflow
+
+
+async def test_admission_rejects_when_saturated(client: AsyncClient) -> None:
+    with patch.object(ADMISSION, "wait", 0), patch.object(ADMISSION, "limit", 0):
+        ADMISSION.reset()
+        response = await client.get("/info/abc")
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == str(settings.admission_retry_after_seconds)
+
+
+async def test_filter_status(client: AsyncClient) -> None:
+    response = await client.get("/status/filter")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["ready"] is False
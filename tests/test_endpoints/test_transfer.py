@@ -0,0 +1,75 @@
+import json
+from collections.abc import Awaitable, Callable
+from datetime import date, timedelta
+
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from source.database.models import Detail, Link
+
+
+async def test_import__ndjson(
+    client: AsyncClient, random_url: str, link_factory: Callable[..., Awaitable[Link]], db_session: AsyncSession
+) -> None:
+    await link_factory(url=random_url, code="taken")
+
+    rows = [
+        {"url": "https://example.com/1", "code": "abc", "lifetime": None},
+        {"url": "https://example.com/2", "code": "taken", "lifetime": 5},
+        {"url": "https://example.com/3", "code": "xyz", "lifetime": 5},
+    ]
+    content = "\n".join(json.dumps(row) for row in rows)
+
+    response = await client.post("/import", content=content, headers={"content-type": "application/x-ndjson"})
+
+    assert response.status_code == status.HTTP_200_OK
+
+    response_data = response.json()
+    assert response_data["imported"] == 2
+    assert response_data["rejected"] == 1
+    assert response_data["errors"] == ["Line 2: Code `taken` is already taken"]
+    assert response_data["rows_per_second"] > 0
+
+    assert await db_session.scalar(select(func.count()).select_from(Link)) == 3
+    assert await db_session.scalar(select(func.count()).select_from(Detail)) == 3
+
+
+async def test_import__csv(client: AsyncClient) -> None:
+    content = "https://example.com/1,abc,1\nhttps://example.com/2,def,0\n"
+
+    response = await client.post("/import", params={"format": "csv"}, content=content)
+
+    assert response.status_code == status.HTTP_200_OK
+
+    response_data = response.json()
+    assert response_data["imported"] == 1
+    assert response_data["rejected"] == 1
+    assert response_data["errors"] == ["Line 2: `lifetime` should be a positive integer or empty"]
+
+
+async def test_export(client: AsyncClient, random_url: str, link_factory: Callable[..., Awaitable[Link]]) -> None:
+    await link_factory(url=random_url, code="abc", length=3, lifetime=5)
+
+    response = await client.get("/export")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 1
+    assert rows[0]["url"] == random_url
+    assert rows[0]["code"] == "abc"
+    assert rows[0]["lifetime"] == 5
+    assert rows[0]["length"] == 3
+    assert rows[0]["modified"] is None
+    assert date.fromisoformat(rows[0]["expires_at"]) == date.fromisoformat(rows[0]["registered"]) + timedelta(days=5)
+
+
+async def test_export__csv(client: AsyncClient) -> None:
+    response = await client.get("/export", params={"format": "csv", "expired": True})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.text == "url,code,lifetime,length,registered,modified,expires_at\n"
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException, status
+
+from source.utils.admission import Admission
+
+
+async def test_admission__admits_up_to_limit() -> None:
+    admission = Admission(limit=2, wait=0.01, retry_after=3)
+
+    async with admission.slot(), admission.slot():
+        assert admission.stats()["active"] == 2
+
+        with pytest.raises(HTTPException) as context:
+            async with admission.slot():
+                pass
+
+    assert context.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert context.value.headers == {"Retry-After": "3"}
+    assert admission.stats() | {"wait_seconds": 0} == {
+        "limit": 2,
+        "active": 0,
+        "waiting": 0,
+        "admitted": 2,
+        "rejected": 1,
+        "wait_seconds": 0,
+    }
+
+
+async def test_admission__queued_request_gets_released_slot() -> None:
+    admission = Admission(limit=1, wait=1, retry_after=1)
+    released = asyncio.Event()
+
+    async def hold() -> None:
+        async with admission.slot():
+            await released.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+
+    async def queue() -> None:
+        async with admission.slot():
+            pass
+
+    waiter = asyncio.create_task(queue())
+    await asyncio.sleep(0)
+    assert admission.stats()["waiting"] == 1
+
+    released.set()
+    await asyncio.gather(holder, waiter)
+
+    assert admission.stats()["admitted"] == 2
+    assert admission.stats()["rejected"] == 0
+    assert admission.stats()["wait_seconds"] > 0
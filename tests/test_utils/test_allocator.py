@@ -0,0 +1,74 @@
+from collections.abc import Awaitable, Callable
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from source.database.models import Link
+from source.utils.allocator import CodeAllocator, CodeReservoir, CodeSpaceExhaustedError
+from source.utils.functions import code
+from source.utils.metrics import METRICS
+
+
+async def test_allocate__unique_across_blocks(engine: AsyncEngine) -> None:
+    allocator = CodeAllocator(block_size=3)
+
+    codes = [await allocator.allocate(engine=engine, length=4) for _ in range(10)]
+
+    assert len(set(codes)) == len(codes)
+    assert all(len(candidate) == 4 for candidate in codes)
+
+
+async def test_allocate__workers_do_not_overlap(engine: AsyncEngine) -> None:
+    first, second = CodeAllocator(block_size=5), CodeAllocator(block_size=5)
+
+    codes = [await allocator.allocate(engine=engine, length=3) for allocator in (first, second) * 10]
+
+    assert len(set(codes)) == len(codes)
+
+
+async def test_allocate__exhausted(engine: AsyncEngine) -> None:
+    allocator = CodeAllocator(block_size=50)
+
+    codes = {await allocator.allocate(engine=engine, length=1) for _ in range(62)}
+    assert len(codes) == 62
+
+    with pytest.raises(CodeSpaceExhaustedError):
+        await allocator.allocate(engine=engine, length=1)
+
+
+async def test_allocate_many(engine: AsyncEngine) -> None:
+    allocator = CodeAllocator(block_size=3)
+
+    codes = await allocator.allocate_many(engine=engine, length=4, count=10)
+    codes += await allocator.allocate_many(engine=engine, length=4, count=2)
+
+    assert len(codes) == 12
+    assert len(set(codes)) == len(codes)
+
+
+async def test_allocate_many__partially_exhausted(engine: AsyncEngine) -> None:
+    allocator = CodeAllocator(block_size=10)
+
+    codes = await allocator.allocate_many(engine=engine, length=1, count=100)
+
+    assert len(codes) == 62
+    assert await allocator.allocate_many(engine=engine, length=1, count=1) == []
+
+
+async def test_reservoir(engine: AsyncEngine, link_factory: Callable[..., Awaitable[Link]]) -> None:
+    METRICS.clear()
+    reservoir = CodeReservoir(allocator=CodeAllocator(block_size=3), lengths=[4], low=2, high=5)
+    await link_factory(code=code(number=0, length=4))  # Taken by an import, yet first in line for the counter
+
+    await reservoir.refill(engine)
+
+    assert reservoir.depths() == {4: 4}
+    assert code(number=0, length=4) not in reservoir.take_many(length=4, count=2)
+
+    await reservoir.refill(engine)  # Still at the low watermark
+    assert reservoir.depths() == {4: 2}
+
+    assert len(reservoir.take_many(length=4, count=3)) == 2
+    assert reservoir.take(4) is None
+    assert reservoir.take(5) is None  # Not a reserved length
+    assert 'turl_code_reservoir_misses_total{length="4"} 2' in METRICS.render()
@@ -0,0 +1,39 @@
+import asyncio
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from source.database.models import Click
+from source.utils.analytics import ClickCounter
+
+
+async def test_flush(engine: AsyncEngine, db_session: AsyncSession) -> None:
+    counter = ClickCounter()
+    for code in ["abc", "abc", "xyz"]:
+        counter.record(code)
+
+    assert await counter.flush(engine) == 2
+    assert len(counter) == 0
+
+    counter.record("abc")
+    assert await counter.flush(engine) == 1
+    assert await counter.flush(engine) == 0
+
+    rows = (await db_session.execute(select(Click.code, Click.day, Click.count).order_by(Click.code))).all()
+    assert [tuple(row) for row in rows] == [("abc", date.today(), 3), ("xyz", date.today(), 1)]
+
+
+@pytest.mark.parametrize("error", [ConnectionError, asyncio.CancelledError])
+async def test_flush__keeps_counts_on_failure(engine: AsyncEngine, error: type[BaseException]) -> None:
+    counter = ClickCounter()
+    counter.record("abc")
+
+    with patch("source.utils.analytics.insert", side_effect=error), pytest.raises(error):
+        await counter.flush(engine)
+
+    counter.record("abc")
+    assert len(counter) == 1
+    assert await counter.flush(engine) == 1
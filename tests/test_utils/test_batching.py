@@ -0,0 +1,103 @@
+import asyncio
+from functools import partial
+
+import pytest
+
+from source.utils.batching import GroupCommit, SingleFlight
+from source.utils.metrics import METRICS
+
+
+async def test_group_commit__groups_concurrent_items() -> None:
+    groups: list[tuple[str, list[int]]] = []
+
+    async def flush(key: str, items: list[int]) -> list[int]:
+        groups.append((key, items))
+        return [2 * item for item in items]
+
+    group = GroupCommit(flush=flush, delay=0.01, size=3)
+
+    results = await asyncio.gather(*(group.submit("first", item) for item in range(5)), group.submit("second", 10))
+
+    assert results == [0, 2, 4, 6, 8, 20]
+    assert groups == [("first", [0, 1, 2]), ("first", [3, 4]), ("second", [10])]  # By size, then by delay
+
+
+async def test_group_commit__failure_reaches_every_item() -> None:
+    async def flush(key: str, items: list[int]) -> list[int]:
+        raise RuntimeError(f"{key} is down")
+
+    group = GroupCommit(flush=flush, delay=0.01, size=10)
+
+    results = await asyncio.gather(group.submit("first", 1), group.submit("first", 2), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+async def test_group_commit__cancelled_item_is_written() -> None:
+    written: list[int] = []
+
+    async def flush(key: str, items: list[int]) -> list[int]:  # pylint: disable=unused-argument
+        written.extend(items)
+        return items
+
+    group = GroupCommit(flush=flush, delay=0.01, size=10)
+    abandoned = asyncio.create_task(group.submit("first", 1))
+    await asyncio.sleep(0)
+    abandoned.cancel()
+
+    assert await group.submit("first", 2) == 2
+    assert written == [1, 2]
+    with pytest.raises(asyncio.CancelledError):
+        await abandoned
+
+
+async def test_single_flight__shares_results_and_errors() -> None:
+    METRICS.clear()
+    calls: list[str] = []
+
+    async def lookup(key: str) -> str:
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        if key == "missing":
+            raise LookupError(key)
+        return key.upper()
+
+    flights: SingleFlight[str, str] = SingleFlight(timeout=1)
+
+    results = await asyncio.gather(
+        *(flights.run(key, partial(lookup, key)) for key in ["abc", "abc", "def", "missing", "missing"]),
+        return_exceptions=True,
+    )
+
+    assert results[:3] == ["ABC", "ABC", "DEF"]
+    assert all(isinstance(result, LookupError) for result in results[3:])
+    assert calls == ["abc", "def", "missing"]
+    assert "turl_coalesced_requests_total 2" in METRICS.render()
+
+    assert await flights.run("abc", lambda: lookup("abc")) == "ABC"  # Not remembered once landed
+    assert calls[-1] == "abc"
+
+
+async def test_single_flight__timeout_and_abandoned_leader() -> None:
+    started = asyncio.Event()
+
+    async def slow() -> str:
+        started.set()
+        await asyncio.sleep(1)
+        return "slow"
+
+    async def fast() -> str:
+        return "fast"
+
+    flights: SingleFlight[str, str] = SingleFlight(timeout=0.01)
+    leader = asyncio.create_task(flights.run("abc", slow))
+    await started.wait()
+
+    with pytest.raises(TimeoutError):
+        await flights.run("abc", fast)
+
+    follower = asyncio.create_task(flights.run("abc", fast))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == "fast"  # Looked up on its own once the leader gave up
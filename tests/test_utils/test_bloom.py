@@ -0,0 +1,91 @@
+import time
+from collections.abc import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from source.database.models import Link
+from source.utils.bloom import BloomFilter, CodeFilter
+
+
+def test_bloom_filter() -> None:
+    bloom = BloomFilter(capacity=10_000, error_rate=0.01)
+    for index in range(10_000):
+        bloom.add(f"in{index}")
+
+    assert all(f"in{index}" in bloom for index in range(10_000))  # Never a false negative
+    assert sum(f"out{index}" in bloom for index in range(10_000)) < 200
+    assert 0.005 < bloom.false_positive_rate() < 0.02
+    assert 9_900 < bloom.count <= 10_000
+
+
+def test_bloom_filter__repeated_items() -> None:
+    bloom = BloomFilter(capacity=100, error_rate=0.01)
+    for _ in range(10):
+        bloom.add("abc")
+
+    assert bloom.count == 1
+    assert bloom.filled == bloom.hashes
+
+
+def test_code_filter__not_ready() -> None:
+    codes = CodeFilter(enabled=True, capacity=100, error_rate=0.01, overlap=2)
+
+    assert codes.may_exist("abc")
+    assert not codes.rejects("abc")
+    assert codes.needs_rebuild()
+    assert codes.stats()["ready"] == 0
+
+
+async def test_code_filter__build_and_sync(engine: AsyncEngine, link_factory: Callable[..., Awaitable[Link]]) -> None:
+    codes = CodeFilter(enabled=True, capacity=100, error_rate=0.01, overlap=2)
+    await link_factory(code="first")
+
+    await codes.refresh(engine)
+
+    assert codes.may_exist("first")
+    assert not codes.may_exist("second")
+
+    await link_factory(code="second")  # Inserted by another worker
+    await codes.refresh(engine)
+
+    assert codes.may_exist("second")
+    assert codes.stats()["codes"] == 2
+
+
+async def test_code_filter__rebuilt_after_deletions(
+    engine: AsyncEngine, link_factory: Callable[..., Awaitable[Link]]
+) -> None:
+    codes = CodeFilter(enabled=True, capacity=100, error_rate=0.01, overlap=2)
+    await link_factory(code="first")
+    await codes.build(engine)
+
+    codes.discard(1)
+
+    assert codes.needs_rebuild()
+    await codes.refresh(engine)
+    assert codes.stats()["stale"] == 0
+
+
+async def test_code_filter__disabled(engine: AsyncEngine) -> None:
+    codes = CodeFilter(enabled=False, capacity=100, error_rate=0.01, overlap=2)
+
+    await codes.refresh(engine)
+
+    assert codes.may_exist("abc")
+
+
+async def test_code_filter__trusted_once_synced_after_listening(engine: AsyncEngine) -> None:
+    codes = CodeFilter(enabled=True, capacity=100, error_rate=0.01, overlap=2)
+    await codes.refresh(engine)
+
+    assert not codes.rejects("abc")  # Nobody listens for other workers' codes
+
+    codes.listening_since = time.monotonic()
+    assert not codes.rejects("abc")  # Codes created while not listening may be missing
+
+    await codes.refresh(engine)
+    assert codes.rejects("abc")
+    assert codes.stats()["trusted"] == 1
+
+    codes.listening_since = None  # Disconnected
+    assert not codes.rejects("abc")
@@ -0,0 +1,86 @@
+import time
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from source.utils.cache import LinkCache
+
+
+def test_cache__hit_and_miss() -> None:
+    cache = LinkCache(size=2, ttl=60, negative_ttl=5)
+
+    assert cache.get("abc") is None
+
+    cache.set("abc", "https://example.com")
+    entry = cache.get("abc")
+
+    assert entry is not None
+    assert entry.url == "https://example.com"
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 1, "evictions": 0}
+
+
+def test_cache__negative_entry() -> None:
+    cache = LinkCache(size=2, ttl=60, negative_ttl=5)
+    cache.set("abc", None)
+
+    entry = cache.get("abc")
+
+    assert entry is not None
+    assert entry.url is None
+
+
+def test_cache__evicts_least_recently_used() -> None:
+    cache = LinkCache(size=2, ttl=60, negative_ttl=5)
+    cache.set("a", "https://a.com")
+    cache.set("b", "https://b.com")
+    cache.get("a")  # "b" becomes the least recently used entry
+    cache.set("c", "https://c.com")
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.evictions == 1
+
+
+def test_cache__evicts_expired_entries() -> None:
+    cache = LinkCache(size=2, ttl=60, negative_ttl=5)
+
+    with patch("source.utils.cache.time.monotonic", return_value=0):
+        cache.set("positive", "https://example.com")
+        cache.set("negative", None)
+
+    with patch("source.utils.cache.time.monotonic", return_value=10):
+        assert cache.get("positive") is not None
+        assert cache.get("negative") is None
+
+    with patch("source.utils.cache.time.monotonic", return_value=60):
+        assert cache.get("positive") is None
+
+    assert cache.evictions == 2
+    assert len(cache) == 0
+
+
+def test_cache__invalidate() -> None:
+    cache = LinkCache(size=2, ttl=60, negative_ttl=5)
+    cache.set("a", "https://a.com")
+    cache.set("b", None)
+
+    cache.invalidate("a", "b", "c")
+
+    assert len(cache) == 0
+
+
+def test_cache__disabled() -> None:
+    cache = LinkCache(size=0, ttl=60, negative_ttl=5)
+    cache.set("a", "https://a.com")
+
+    assert cache.get("a") is None
+
+
+def test_cache__entries_do_not_outlive_expiry() -> None:
+    cache = LinkCache(size=2, ttl=86400 * 7, negative_ttl=5)
+    cache.set("today", "https://example.com", expires_at=date.today())
+    cache.set("later", "https://example.com", expires_at=date.today() + timedelta(days=30))
+
+    with patch("source.utils.cache.time.monotonic", return_value=time.monotonic() + 86400):
+        assert cache.get("today") is None
+        assert cache.get("later") is not None
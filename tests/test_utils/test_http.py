@@ -0,0 +1,47 @@
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from source.settings import settings
+from source.utils.http import entity_tag, http_date, not_modified, redirect_cache_control
+
+
+def test_redirect_cache_control() -> None:
+    with patch.object(settings, "redirect_max_age_seconds", 3600):
+        assert redirect_cache_control(None) == "public, max-age=3600"
+        assert redirect_cache_control(date.today() + timedelta(days=5)) == "public, max-age=3600"
+        assert redirect_cache_control(date.today() - timedelta(days=1)) == "public, max-age=0"
+
+
+def test_entity_tag() -> None:
+    assert entity_tag(b"a") == entity_tag(b"a")
+    assert entity_tag(b"a") != entity_tag(b"b")
+    assert entity_tag(b"a").startswith('W/"')
+
+
+def test_http_date() -> None:
+    assert http_date(date(2026, 1, 2)) == "Fri, 02 Jan 2026 00:00:00 GMT"
+
+
+def test_not_modified__if_none_match() -> None:
+    etag, last_modified = entity_tag(b"a"), date(2026, 1, 2)
+
+    assert not_modified({"if-none-match": etag}, etag=etag, last_modified=last_modified)
+    assert not_modified({"if-none-match": f'"x", {etag.removeprefix("W/")}'}, etag=etag, last_modified=last_modified)
+    assert not_modified({"if-none-match": "*"}, etag=etag, last_modified=last_modified)
+    assert not not_modified({"if-none-match": '"x"'}, etag=etag, last_modified=last_modified)
+    # Takes precedence over `If-Modified-Since`
+    headers = {"if-none-match": '"x"', "if-modified-since": http_date(date(2026, 1, 3))}
+    assert not not_modified(headers, etag=etag, last_modified=last_modified)
+
+
+def test_not_modified__if_modified_since() -> None:
+    etag, yesterday = entity_tag(b"a"), date.today() - timedelta(days=1)
+
+    assert not_modified({"if-modified-since": http_date(yesterday)}, etag=etag, last_modified=yesterday)
+    assert not not_modified(
+        {"if-modified-since": http_date(yesterday - timedelta(days=1))}, etag=etag, last_modified=yesterday
+    )
+    assert not not_modified({"if-modified-since": "garbage"}, etag=etag, last_modified=yesterday)
+    # Changes later on the same day would not move a `Last-Modified` of today
+    assert not not_modified({"if-modified-since": http_date(date.today())}, etag=etag, last_modified=date.today())
+    assert not not_modified({}, etag=etag, last_modified=yesterday)
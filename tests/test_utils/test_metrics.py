@@ -0,0 +1,97 @@
+import json
+import os
+import time
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from source.utils.metrics import METRICS, Metrics, instrument
+
+
+def test_metrics__counter_and_gauge() -> None:
+    metrics = Metrics(directory=None, stale=15, retire=60)
+    metrics.inc("turl_encode_retries_total", endpoint="encode")
+    metrics.inc("turl_encode_retries_total", 2, endpoint="encode")
+    metrics.set("turl_db_pool_connections", 4, database="primary", state="checked_in")
+
+    rendered = metrics.render()
+
+    assert "# TYPE turl_encode_retries_total counter" in rendered
+    assert 'turl_encode_retries_total{endpoint="encode"} 3' in rendered
+    assert 'turl_db_pool_connections{database="primary",state="checked_in"} 4' in rendered
+
+
+def test_metrics__histogram() -> None:
+    metrics = Metrics(directory=None, stale=15, retire=60)
+    for value in (0.0005, 0.003, 0.003, 20):
+        metrics.observe("turl_request_duration_seconds", value, route="/d/{code}", method="GET")
+
+    rendered = metrics.render()
+
+    labels = 'route="/d/{code}",method="GET"'
+    assert f'turl_request_duration_seconds_bucket{{{labels},le="0.001"}} 1' in rendered
+    assert f'turl_request_duration_seconds_bucket{{{labels},le="0.005"}} 3' in rendered
+    assert f'turl_request_duration_seconds_bucket{{{labels},le="10"}} 3' in rendered
+    assert f'turl_request_duration_seconds_bucket{{{labels},le="+Inf"}} 4' in rendered
+    assert f"turl_request_duration_seconds_count{{{labels}}} 4" in rendered
+    assert f"turl_request_duration_seconds_sum{{{labels}}} 20.0065" in rendered
+
+
+async def test_metrics__aggregates_workers(tmp_path: Path) -> None:
+    worker = Metrics(directory=str(tmp_path), stale=15, retire=60)
+    worker.inc("turl_rate_limit_rejections_total", policy="redirect")
+    worker.set("turl_db_pool_connections", 2, database="primary", state="checked_out")
+    await worker.publish()
+    (tmp_path / f"{os.getpid()}.json").rename(tmp_path / "other.json")  # As if another worker had published it
+
+    scraper = Metrics(directory=str(tmp_path), stale=15, retire=60)
+    scraper.inc("turl_rate_limit_rejections_total", policy="redirect")
+    rendered = scraper.render()
+
+    assert 'turl_rate_limit_rejections_total{policy="redirect"} 2' in rendered
+    assert 'turl_db_pool_connections{database="primary",state="checked_out"} 2' in rendered
+
+
+async def test_metrics__drops_stale_gauges(tmp_path: Path) -> None:
+    snapshot = {
+        "time": time.time() - 60,
+        "counters": [["turl_admission_rejections_total", [], 5]],
+        "gauges": [["turl_db_pool_connections", [["database", "primary"], ["state", "size"]], 5]],
+        "histograms": [],
+    }
+    (tmp_path / "1.json").write_text(json.dumps(snapshot))
+
+    rendered = Metrics(directory=str(tmp_path), stale=15, retire=60).render()
+
+    assert "turl_admission_rejections_total 5" in rendered  # Counters of exited workers still count
+    assert "turl_db_pool_connections{" not in rendered
+
+
+async def test_metrics__folds_retired_workers(tmp_path: Path) -> None:
+    for pid in (1, 2):
+        exited = Metrics(directory=None, stale=15, retire=60)
+        exited.inc("turl_admission_rejections_total", pid)
+        exited.observe("turl_request_duration_seconds", 0.5, route="/encode", method="POST")
+        (tmp_path / f"{pid}.json").write_text(json.dumps({**exited.snapshot(), "time": time.time() - 120}))
+
+    worker = Metrics(directory=str(tmp_path), stale=15, retire=60)
+    worker.inc("turl_admission_rejections_total")
+    await worker.publish()
+    (tmp_path / f"{os.getpid()}.json").rename(tmp_path / "3.json")  # As if the worker had exited since
+    await Metrics(directory=str(tmp_path), stale=15, retire=0).publish()
+
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == [f"{os.getpid()}.json", "retired.json"]
+    rendered = Metrics(directory=str(tmp_path), stale=15, retire=60).render()
+    assert "turl_admission_rejections_total 4" in rendered  # Totals survive the folding
+    assert 'turl_request_duration_seconds_count{route="/encode",method="POST"} 2' in rendered
+
+
+async def test_instrument(engine: AsyncEngine) -> None:
+    instrument(engine, database="primary")
+
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+    assert 'turl_db_query_duration_seconds_count{database="primary"} 1' in METRICS.render()
+    METRICS.clear()
@@ -0,0 +1,132 @@
+import struct
+import threading
+from collections.abc import Awaitable, Callable, Iterator
+from datetime import date, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from source.database.models import Click, Link
+from source.utils.shared import SharedLinkTable, fingerprint
+
+
+@pytest.fixture(name="tables")
+def fixture_tables(tmp_path: Path) -> Iterator[tuple[SharedLinkTable, SharedLinkTable]]:
+    # A writer and a reader of the same file, as two workers would be
+    writer, reader = (SharedLinkTable(path=str(tmp_path / "links"), slots=64, url_bytes=64, ttl=60) for _ in range(2))
+    yield writer, reader
+    writer.close()
+    reader.close()
+
+
+def test_store_and_get(tables: tuple[SharedLinkTable, SharedLinkTable]) -> None:
+    writer, reader = tables
+    tomorrow = date.today() + timedelta(days=1)
+
+    assert writer.acquire()
+    assert not reader.acquire()  # One writer per file
+    stored = writer.store([("abc", "https://example.com", None), ("def", "https://example.org", tomorrow)])
+
+    assert stored == 2
+    assert (entry := reader.get("abc")) is not None and entry.url == "https://example.com"
+    assert (entry := reader.get("def")) is not None and entry.expires_at == tomorrow
+    assert reader.get("ghi") is None
+
+    writer.store([("def", "https://example.org", tomorrow)])  # Replaces the contents
+    assert reader.get("abc") is None
+    assert reader.get("def") is not None
+
+
+def test_store__skips_long_urls_and_full_probes(tables: tuple[SharedLinkTable, SharedLinkTable]) -> None:
+    writer, reader = tables
+    writer.acquire()
+
+    stored = writer.store([("long", "https://example.com/" + "a" * 64, None)])
+    assert stored == 0 and reader.get("long") is None
+
+    codes = [f"code{index}" for index in range(200)]  # More than the slots
+    assert writer.store([(code, "https://example.com", None) for code in codes]) <= 64
+    assert sum(reader.get(code) is not None for code in codes) <= 64
+
+
+def test_get__torn_and_stale_slots(tables: tuple[SharedLinkTable, SharedLinkTable]) -> None:
+    writer, reader = tables
+    writer.acquire()
+    writer.store([("abc", "https://example.com", None)])
+    offset = next(
+        slot * writer.slot_size
+        for slot in range(writer.slots)
+        if writer.HEADER.unpack_from(writer.open(), slot * writer.slot_size)[1] == fingerprint("abc")
+    )
+    sequence = writer.HEADER.unpack_from(writer.open(), offset)[0]
+
+    struct.pack_into("=I", writer.open(), offset, sequence + 1)  # Writer in the middle of the slot
+    assert reader.get("abc") is None
+
+    struct.pack_into("=I", writer.open(), offset, sequence)
+    assert reader.get("abc") is not None
+
+    expired = date.today() - timedelta(days=1)
+    writer.store([("abc", "https://example.com", expired)])
+    assert reader.get("abc") is None
+
+
+def test_invalidate__writer_only(tables: tuple[SharedLinkTable, SharedLinkTable]) -> None:
+    writer, reader = tables
+    writer.acquire()
+    writer.store([("abc", "https://example.com", None)])
+
+    reader.invalidate("abc")
+    assert reader.get("abc") is not None
+
+    writer.invalidate("abc")
+    assert reader.get("abc") is None
+
+
+async def test_refresh(
+    engine: AsyncEngine,
+    db_session: AsyncSession,
+    link_factory: Callable[..., Awaitable[Link]],
+    tables: tuple[SharedLinkTable, SharedLinkTable],
+) -> None:
+    writer, reader = tables
+    await link_factory(code="hot", url="https://example.com")
+    await link_factory(code="cold", url="https://example.org")
+    db_session.add(Click(code="hot", day=date.today(), count=10))
+    await db_session.commit()
+
+    await reader.refresh(engine)  # Tries to become the writer first
+    await writer.refresh(engine)
+
+    assert reader.writer and not writer.writer
+    assert (entry := writer.get("hot")) is not None and entry.url == "https://example.com"
+    assert writer.get("cold") is None
+
+
+async def test_refresh__skips_codes_invalidated_meanwhile(
+    engine: AsyncEngine,
+    db_session: AsyncSession,
+    link_factory: Callable[..., Awaitable[Link]],
+    tables: tuple[SharedLinkTable, SharedLinkTable],
+) -> None:
+    writer, _ = tables
+    await link_factory(code="hot", url="https://example.com")
+    db_session.add(Click(code="hot", day=date.today(), count=10))
+    await db_session.commit()
+    store, threads = writer.store, []
+
+    def invalidated_first(links: list[tuple[str, str, date | None]]) -> int:
+        threads.append(threading.current_thread())
+        writer.invalidate("hot")  # Changed by another worker after the rows were read
+        return store(links)
+
+    with patch.object(writer, "store", side_effect=invalidated_first):
+        await writer.refresh(engine)
+
+    assert threads != [threading.current_thread()]  # Stored off the event loop
+    assert writer.get("hot") is None
+
+    await writer.refresh(engine)
+    assert writer.get("hot") is not None  # Read again by the next refresh
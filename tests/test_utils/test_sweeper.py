@@ -0,0 +1,35 @@
+from datetime import date, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from source.database.models import Detail, Link
+from source.utils.cache import CACHE
+from source.utils.sweeper import sweep
+
+
+def make_link(code: str, expires_at: date | None) -> Link:
+    return Link(
+        url=f"https://example.com/{code}",
+        code=code,
+        expires_at=expires_at,
+        detail=Detail(length=len(code), lifetime=None if expires_at is None else 1),
+    )
+
+
+async def test_sweep(engine: AsyncEngine, db_session: AsyncSession) -> None:
+    today = date.today()
+    db_session.add_all(
+        [make_link(f"old{index}", today - timedelta(days=index + 1)) for index in range(5)]
+        + [make_link("today", today), make_link("forever", None), make_link("grace", today - timedelta(days=10))]
+    )
+    await db_session.commit()
+    CACHE.set("old0", "https://example.com/old0")
+
+    assert await sweep(engine, batch_size=2, grace_days=7) == 1
+    assert await sweep(engine, batch_size=2, grace_days=0) == 5
+    assert await sweep(engine, batch_size=2, grace_days=0) == 0
+
+    assert CACHE.get("old0") is None
+    assert set(await db_session.scalars(select(Link.code))) == {"today", "forever"}
+    assert len((await db_session.scalars(select(Detail))).all()) == 2
@@ -0,0 +1,72 @@
+from pathlib import Path
+
+from source.utils.throttle import MemoryStore, Policy, SharedMemoryStore
+
+POLICY = Policy(name="test", capacity=2, window=10)  # one token every five seconds
+
+
+def test_memory_store__allows_burst_then_waits() -> None:
+    store = MemoryStore(size=10)
+
+    assert store.take("client", POLICY, now=0) == 0
+    assert store.take("client", POLICY, now=0) == 0
+    assert store.take("client", POLICY, now=0) == 5
+
+
+def test_memory_store__refills_over_time() -> None:
+    store = MemoryStore(size=10)
+    for _ in range(2):
+        store.take("client", POLICY, now=0)
+
+    assert store.take("client", POLICY, now=1) == 4
+    assert store.take("client", POLICY, now=5) == 0
+    assert store.take("client", POLICY, now=1000) == 0
+    assert store.take("client", POLICY, now=1000) == 0  # refilled up to the capacity only
+    assert store.take("client", POLICY, now=1000) > 0
+
+
+def test_memory_store__separates_clients() -> None:
+    store = MemoryStore(size=10)
+    for _ in range(2):
+        store.take("a", POLICY, now=0)
+
+    assert store.take("a", POLICY, now=0) > 0
+    assert store.take("b", POLICY, now=0) == 0
+
+
+def test_memory_store__evicts_least_recently_seen() -> None:
+    store = MemoryStore(size=2)
+    store.take("a", POLICY, now=0)
+    store.take("b", POLICY, now=0)
+    store.take("c", POLICY, now=0)
+
+    assert len(store) == 2
+    assert store.take("a", POLICY, now=0) == 0  # "a" starts over with a full bucket
+    assert store.take("a", POLICY, now=0) == 0
+
+
+def test_shared_memory_store__shared_between_instances(tmp_path: Path) -> None:
+    path = str(tmp_path / "buckets")
+    first, second = SharedMemoryStore(path=path, size=64), SharedMemoryStore(path=path, size=64)
+
+    try:
+        assert first.take("client", POLICY, now=0) == 0
+        assert second.take("client", POLICY, now=0) == 0
+        assert first.take("client", POLICY, now=0) == 5
+        assert second.take("client", POLICY, now=5) == 0
+    finally:
+        first.close()
+        second.close()
+
+
+def test_shared_memory_store__slot_collision_resets_bucket(tmp_path: Path) -> None:
+    store = SharedMemoryStore(path=str(tmp_path / "buckets"), size=1)
+
+    try:
+        for _ in range(2):
+            store.take("a", POLICY, now=0)
+
+        assert store.take("b", POLICY, now=0) == 0  # "b" replaces "a" in the only slot
+        assert store.take("a", POLICY, now=0) == 0
+    finally:
+        store.close()
@@ -0,0 +1,177 @@
+import json
+from collections.abc import AsyncIterator, Awaitable, Callable
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import joinedload
+
+from source.database.models import Detail, Link
+from source.utils.transfer import (
+    export_links,
+    export_statement,
+    import_links,
+    iterate_lines,
+    parse_csv,
+    parse_ndjson,
+    parse_row,
+    serialize,
+)
+
+
+async def stream(*items: str) -> AsyncIterator[str]:
+    for item in items:
+        yield item
+
+
+async def chunks(*items: bytes) -> AsyncIterator[bytes]:
+    for item in items:
+        yield item
+
+
+@pytest.mark.parametrize(
+    "url, code, lifetime, expected",
+    [
+        ("https://example.com", "abc", None, ("https://example.com", "abc", None)),
+        ("http://example.com/path?query=1", "a_b-C", "7", ("http://example.com/path?query=1", "a_b-C", 7)),
+        ("https://example.com", "abc", 3, ("https://example.com", "abc", 3)),
+        ("https://example.com", "abc", "", ("https://example.com", "abc", None)),
+    ],
+)
+def test_parse_row__success(url: str, code: str, lifetime: int | str | None, expected: tuple) -> None:
+    assert parse_row(url, code, lifetime) == expected
+
+
+@pytest.mark.parametrize(
+    "url, code, lifetime, error_message",
+    [
+        ("ftp://example.com", "abc", None, "`url` should be a valid http or https URL"),
+        ("https://", "abc", None, "`url` should be a valid http or https URL"),
+        ("https://example.com/a b", "abc", None, "`url` should be a valid http or https URL"),
+        (None, "abc", None, "`url` should be a string"),
+        ("https://example.com/" + "a" * 2048, "abc", None, "`url` should be a string"),
+        ("https://example.com/" + "ä" * 1100, "abc", None, "`url` should take at most 2048 bytes"),
+        ("https://example.com", "", None, "`code` should consist"),
+        ("https://example.com", "a/b", None, "`code` should consist"),
+        ("https://example.com", "a" * 65, None, "`code` should consist"),
+        ("https://example.com", "abc", 0, "`lifetime` should be a positive integer"),
+        ("https://example.com", "abc", -1, "`lifetime` should be a positive integer"),
+        ("https://example.com", "abc", 1.5, "`lifetime` should be a positive integer"),
+        ("https://example.com", "abc", True, "`lifetime` should be a positive integer"),
+        ("https://example.com", "abc", "soon", "`lifetime` should be a positive integer"),
+    ],
+)
+def test_parse_row__failure(url: str | None, code: str, lifetime: object, error_message: str) -> None:
+    with pytest.raises(ValueError) as context:
+        parse_row(url, code, lifetime)
+    assert error_message in str(context.value)
+
+
+def test_parse_formats() -> None:
+    assert parse_ndjson('{"url": "https://example.com", "code": "abc", "lifetime": 2}') == (
+        "https://example.com",
+        "abc",
+        2,
+    )
+    assert parse_csv('"https://example.com/?a=1,2",abc') == ("https://example.com/?a=1,2", "abc", None)
+
+    with pytest.raises(ValueError):
+        parse_ndjson("[1, 2]")
+    with pytest.raises(ValueError):
+        parse_ndjson("{")
+    with pytest.raises(ValueError):
+        parse_csv("https://example.com")
+
+
+async def test_iterate_lines() -> None:
+    lines = [line async for line in iterate_lines(chunks(b"first\nsec", b"ond\n", b"third"))]
+    assert lines == ["first", "second", "third"]
+
+
+async def test_import_links(engine: AsyncEngine, db_session: AsyncSession) -> None:
+    lines = stream(
+        "url,code,lifetime",
+        "https://example.com/1,first,3",
+        "https://example.com/2,second,",
+        "not-a-url,third,",
+        "https://example.com/4,first,",
+        "",
+        "https://example.com/5,fifth,1",
+    )
+
+    report = await import_links(engine=engine, lines=lines, file_format="csv", batch_size=2)
+
+    assert report.imported == 3
+    assert report.rejected == 2
+    assert report.errors == [
+        "Line 4: `url` should be a valid http or https URL",
+        "Line 5: Code `first` is already taken",
+    ]
+
+    links = (await db_session.scalars(select(Link).options(joinedload(Link.detail)).order_by(Link.code))).all()
+    assert [(link.code, link.url, link.detail.length, link.detail.lifetime) for link in links] == [
+        ("fifth", "https://example.com/5", 5, 1),
+        ("first", "https://example.com/1", 5, 3),
+        ("second", "https://example.com/2", 6, None),
+    ]
+
+
+def test_serialize() -> None:
+    rows = [("https://example.com", "abc", 3, 3, date(2025, 1, 1), None, date(2025, 1, 4))]
+
+    assert json.loads(serialize(rows, file_format="ndjson")) == {
+        "url": "https://example.com",
+        "code": "abc",
+        "lifetime": 3,
+        "length": 3,
+        "registered": "2025-01-01",
+        "modified": None,
+        "expires_at": "2025-01-04",
+    }
+    assert serialize(rows, file_format="csv", header=True).decode().splitlines() == [
+        "url,code,lifetime,length,registered,modified,expires_at",
+        "https://example.com,abc,3,3,2025-01-01,,2025-01-04",
+    ]
+    assert parse_csv(serialize(rows, file_format="csv").decode()) == ("https://example.com", "abc", 3)
+
+
+async def test_export_links(engine: AsyncEngine, link_factory: Callable[..., Awaitable[Link]]) -> None:
+    for index in range(5):
+        await link_factory(url=f"https://example.com/{index}", code=f"code{index}")
+
+    exported = [
+        chunk
+        async for chunk in export_links(engine=engine, statement=export_statement(), file_format="csv", chunk_size=2)
+    ]
+
+    assert len(exported) == 3
+    lines = b"".join(exported).decode().splitlines()
+    assert lines[0] == "url,code,lifetime,length,registered,modified,expires_at"
+    assert [line.split(",")[1] for line in lines[1:]] == [f"code{index}" for index in range(5)]
+
+
+async def test_export_links__filters(engine: AsyncEngine, db_session: AsyncSession) -> None:
+    db_session.add_all(
+        [
+            Link(
+                url="https://example.com/1",
+                code="old",
+                expires_at=date(2020, 1, 2),
+                detail=Detail(length=3, lifetime=1, registered=date(2020, 1, 1)),
+            ),
+            Link(url="https://example.com/2", code="new", detail=Detail(length=3, lifetime=None)),
+        ]
+    )
+    await db_session.commit()
+
+    async def export(**filters: object) -> list[str]:
+        statement = export_statement(**filters)  # type: ignore[arg-type]
+        exported = [chunk async for chunk in export_links(engine=engine, statement=statement, file_format="ndjson")]
+        return [json.loads(line)["code"] for line in b"".join(exported).decode().splitlines()]
+
+    assert await export() == ["old", "new"]
+    assert await export(expired=True) == ["old"]
+    assert await export(expired=False) == ["new"]
+    assert await export(registered_to=date(2021, 1, 1)) == ["old"]
+    assert await export(registered_from=date(2021, 1, 1)) == ["new"]